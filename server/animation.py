@@ -1,12 +1,36 @@
 
-import neopixel
 import time
-import threading
 import random
+import numpy as np
 from logger import Logger
 from color_palettes import CANDLE_COLORS_TUPLE
+from frame_buffer import FrameBuffer, to_rgb
+from palette_registry import PALETTES
+from scheduler import DeadlineScheduler
+from render_engine import RenderEngine
+from particles import ParticleSystem
+from clip_cache import CLIP_CACHE
+from fractions import Fraction
 import math
-import board
+from functools import lru_cache
+
+UPDATE_EVENT = "update"
+DROPPED_STEPS_STAT = "dropped_steps"
+MAX_CATCH_UP_UPDATES = 4  # Updates' worth of steps an effect may catch up on at once before dropping time
+
+
+def _triwave8(x):
+    return int(127.5 * (1 + math.sin(math.radians(x * 360 / 255))))
+
+
+def _dim8_lin(x):
+    return int((x / 255) ** 2.5 * 255)
+
+
+# Twinkle brightness for every wave position (triwave8 composed with dim8_lin).
+# Widened to uint16 so it can be multiplied against 8-bit colors without overflow.
+TWINKLE_BRIGHTNESS_LUT = np.array([_dim8_lin(_triwave8(x)) for x in range(256)], dtype=np.uint16)
+
 
 class Animation:
     def __init__(self, pixel_count, pixels, delay=0.01, speed=1, fps_render=60):
@@ -15,80 +39,259 @@ class Animation:
 
         :param pixel_count: Number of pixels on LEDs
         :param pixels: Pixel RGB data
-        :param delay: Delay set between update calls. Defaults to 10ms delay (~100 FPS)
-        :param speed: Speed rate relative to delay. (2.0 = double speed, 0.5 = half speed)
+        :param delay: Effect time per step. Defaults to 10ms (~100 steps per second)
+        :param speed: Rate the effect clock runs at. (2.0 = double speed, 0.5 = half speed)
         """
         self.pixel_count = pixel_count
-        self.pixels = pixels  # Pre-initialized NeoPixel object
-        self.delay = delay / speed
-        self.last_update_time = time.monotonic()
-        self.last_show_time = time.monotonic()
+        self.pixels = pixels  # Pixel output backend the render engine shows frames on
+        self.frame = FrameBuffer(pixel_count)  # Frame the effect renders into
+        self.speed = speed
+        self.delay = delay
         self.show_interval = 1 / fps_render
-        self._stop_event = threading.Event()  # Event to signal the animation thread to stop
-        self._thread = None
+        # Stepping faster than frames are shown is wasted work, so fast effects take several steps per update
+        self.update_interval = max(delay / speed, self.show_interval)
+        self.max_steps = MAX_CATCH_UP_UPDATES * math.ceil(self.update_interval * speed / delay)
+        self.scheduler = DeadlineScheduler()  # Tracks update deadlines and their jitter
+        self.scheduler.add(UPDATE_EVENT, self.update_interval)
+        self.step_clock = 0.0  # Effect time not yet consumed by a step
+        self.last_step_time = None
+        self.dropped_steps = 0
+        self.engine = None  # Render engine ticking this animation while it runs
+        self.clip = None  # Baked frames replayed instead of calling _update (periodic effects only)
+        self.clip_index = 0
+        self.clip_pixels = None  # Clip row each pixel is copied from, when the clip is narrower than the strip
+        self._recording = None  # Clip being captured from the live frames during the effect's first cycle
+        self._recording_cache = None  # ClipCache the recorded clip is stored in once complete
+        self._recorded = 0
         self.TAG = "Animation"
         Logger.info(self.TAG, "Initialize Animation")
         if speed != 1:
             Logger.info(
                 self.TAG,
-                f"Speed is {speed}. Delay {'increased' if speed > 1 else 'decreased'} from {delay} to {self.delay}",
+                f"Speed is {speed}. Effect clock runs {'faster' if speed > 1 else 'slower'}, updating every {self.update_interval * 1000:.1f} ms",
             )
 
     def __del__(self):
         """ Destructor of Animation object. """
         self.stop_animation()
 
-    def _show(self):
-        """ Throttled method to update LED state at 60 FPS. """
-        current_time = time.monotonic()
-        elapsed_time = current_time - self.last_show_time
-
-        if elapsed_time >= self.show_interval:
-            self.pixels.show()  # Call the NeoPixel show method
-            self.last_show_time = current_time
+    def reset_clock(self):
+        """ Restarts the update deadlines and the effect clock. Called when the effect goes live. """
+        self.scheduler.restart()
+        self.step_clock = 0.0
+        self.last_step_time = None
 
     def _update_with_timing(self):
         """ Update call with timing tracked. """
-        current_time = time.monotonic()
-        elapsed_time = current_time - self.last_update_time
-
-        # Check if enough time has passed to update the animation
-        if elapsed_time >= self.delay:
+        # Check if the next update deadline has been reached
+        if self.scheduler.is_due(UPDATE_EVENT):
             start_time = time.monotonic()  # Start timing for processing
-            self._update()  # Call the specific update method
+            steps = self._steps_due(start_time)
+            if steps == 0:
+                return 0
+            self._render_update(steps)  # Call the specific update method (or replay its baked clip)
+            self.frame.changed = True  # Effects write frame.data directly
             end_time = time.monotonic()  # End timing for processing
 
             processing_time = (end_time - start_time) * 1000  # Processing time in milliseconds
 
-            if processing_time > self.delay * 1000:
+            if processing_time > self.update_interval * 1000:
                 Logger.warning(self.TAG, "Animation time budget exceeded")
 
-            self.last_update_time = current_time
-
             return processing_time  # Return processing time in milliseconds
         return 0  # If no update occurred, return 0
 
-    def run_animation(self):
-        """ Runs animation loaded from constructor. """
+    def _steps_due(self, now):
+        """
+        Works out how many steps the effect clock has advanced since the last update.
+
+        :param now: Current monotonic time
+        :return: Number of steps to take now
+        """
+        if self.last_step_time is None:
+            self.last_step_time = now
+            return 1  # First frame as soon as the effect goes live
+
+        self.step_clock += (now - self.last_step_time) * self.speed
+        self.last_step_time = now
+        # Rounded to the nearest step so updates landing just early or late do not alternate 0 and 2 steps
+        steps = int(self.step_clock / self.delay + 0.5)
+        self.step_clock -= steps * self.delay
+
+        if steps > self.max_steps:
+            # Too far behind to catch up: drop the time rather than spiral, the effect slows down
+            self.dropped_steps += steps - self.max_steps
+            self.step_clock = 0.0
+            steps = self.max_steps
+        return steps
+
+    def _render_update(self, steps=1):
+        """
+        Advances the effect, replaying the baked clip if there is one. Only the
+        frame of the last step is kept.
+
+        :param steps: Number of steps to advance
+        """
+        if self.clip is None:
+            for _ in range(steps):
+                self._update()
+                if self._recording is not None:
+                    self._record_step()
+            return
+
+        self.clip_index = (self.clip_index + steps - 1) % len(self.clip)
+        if self.clip_pixels is None:
+            self.frame.data[:] = self.clip[self.clip_index]
+        else:
+            np.take(self.clip[self.clip_index], self.clip_pixels, axis=0, out=self.frame.data)
+        self.clip_index = (self.clip_index + 1) % len(self.clip)
+
+    def get_period(self):
+        """
+        Returns the number of updates after which the effect's frames repeat,
+        or None if it is not periodic. Periodic effects override this.
+        """
+        return None
+
+    def _clip_params(self):
+        """ Returns any extra constructor params that change the rendered frames (part of the clip key). """
+        return ()
+
+    def _clip_width(self):
+        """
+        Returns the number of pixels after which every frame repeats along the
+        strip. Only that many pixels are stored per clip frame. Effects that
+        fill the strip with a pattern override this (1 for a single color).
+        """
+        return self.pixel_count
+
+    def _clip_key(self):
+        """ Returns the key identifying this effect's baked clip. """
+        colors = getattr(self, "colors", None)
+        palette = PALETTES.intern(colors).rgb if colors else None
+        # Speed only scales the effect clock, so clips are shared across speeds. Clips narrower
+        # than the strip are shared across LED counts too
+        return (type(self).__name__, palette, self._clip_width()) + self._clip_params()
+
+    def _use_clip(self, clip):
+        """ Replays a clip from its first frame. """
+        width = clip.shape[1]
+        self.clip_pixels = np.arange(self.pixel_count) % width if width != self.pixel_count else None
+        self.clip = clip
+        self.clip_index = 0
+
+    def _bake_period(self, cache):
+        """
+        Returns the number of frames to bake, or None if the effect is not
+        periodic, its clip would not fit in the cache or it is already being recorded.
+
+        :param cache: ClipCache the clip would be stored in
+        """
+        period = self.get_period()
+        if period is None or self._recording is not None:
+            return None
+        if period * self._clip_width() * 3 > cache.max_bytes:
+            return None
+        return period
+
+    def bake_clip(self, cache=CLIP_CACHE):
+        """
+        Prerenders one full cycle of a periodic effect (or fetches it from the
+        cache) so it can be replayed with no per-frame math. Must be called
+        before the animation starts running.
+
+        :param cache: ClipCache to look up and store the clip in
+        :return: True if the effect will replay a baked clip
+        """
+        if self.clip is not None:
+            return True
+        period = self._bake_period(cache)
+        if period is None:
+            return False
+
+        clip = cache.get(self._clip_key())
+        if clip is None:
+            # Rendering a full period leaves the effect back in its initial state
+            width = self._clip_width()
+            clip = np.empty((period, width, 3), dtype=np.uint8)
+            start_time = time.monotonic()
+            for index in range(period):
+                self._update()
+                clip[index] = self.frame.data[:width]
+            cache.put(self._clip_key(), clip)
+            Logger.info(self.TAG, f"Baked {period} frame clip in {(time.monotonic() - start_time) * 1000:.1f} ms")
+
+        self._use_clip(clip)
+        return True
+
+    def _start_clip(self, cache=CLIP_CACHE):
+        """
+        Replays the cached clip if there is one, otherwise records the clip
+        from the live frames of the first cycle, so starting an effect never
+        waits for a bake.
+
+        :param cache: ClipCache to look up the clip in, and store the recorded clip in
+        """
+        if self.clip is not None:
+            return
+        period = self._bake_period(cache)
+        if period is None:
+            return
+
+        clip = cache.get(self._clip_key())
+        if clip is not None:
+            self._use_clip(clip)
+        else:
+            self._recording = np.empty((period, self._clip_width(), 3), dtype=np.uint8)
+            self._recording_cache = cache
+            self._recorded = 0
+
+    def _record_step(self):
+        """ Captures the frame of one step, and replays the clip once a full cycle is captured. """
+        recording = self._recording
+        recording[self._recorded] = self.frame.data[:recording.shape[1]]
+        self._recorded += 1
+        if self._recorded == len(recording):
+            # A full period has left the effect back in its initial state
+            self._recording_cache.put(self._clip_key(), recording)
+            self._recording = None
+            self._recording_cache = None
+            self._use_clip(recording)
+            Logger.info(self.TAG, f"Recorded {len(recording)} frame clip")
+
+    def prewarm(self):
+        """
+        Does the expensive setup ahead of run_animation() (e.g. on a worker while
+        another animation plays): bakes the clip of periodic effects, or renders
+        a first frame so buffers and lookup tables are touched before going live.
+        """
+        if not self.bake_clip():
+            self._update()
+            self.frame.changed = True
+
+    def run_animation(self, transition=0.0):
+        """
+        Runs animation loaded from constructor on the shared render engine.
+
+        :param transition: Seconds to crossfade from the animation currently running (0 cuts straight over)
+        """
         Logger.info(self.TAG, "Animation started")
-        if self._thread is None or not self._thread.is_alive():
-            self._stop_event.clear()
-            self._thread = threading.Thread(target=self._animation_loop)
-            self._thread.start()
+        self._start_clip()
+        self.engine = RenderEngine.for_pixels(self.pixels)
+        self.engine.attach(self, transition)
 
     def stop_animation(self):
         """ Stops the animation if running. """
         Logger.info(self.TAG, "Animation stopped")
-        self._stop_event.set()  # Signal the thread to stop
-        if self._thread is not None:
-            self._thread.join()  # Wait for the thread to finish
-            self._thread = None
+        if self.engine is not None:
+            self.engine.detach(self)
+            self.engine = None
 
-    def _animation_loop(self):
-        """ Animation loop used for thread. """
-        while not self._stop_event.is_set():
-            self._update_with_timing()
-            self._show()  # Ensure _show is throttled to 60 FPS
+    def get_timing_stats(self):
+        """ Returns the update jitter (how late each update ran relative to its deadline) and steps dropped. """
+        stats = self.scheduler.report()
+        stats[DROPPED_STEPS_STAT] = self.dropped_steps
+        return stats
 
 class CycleFade(Animation):
     def __init__(self, pixel_count, pixels, colors, steps=255, delay=0.01, speed=1, fps_render=60):
@@ -110,6 +313,17 @@ class CycleFade(Animation):
         self.TAG = "CycleFade"
         Logger.info(self.TAG, "Loading the CycleFade animation")
 
+    def get_period(self):
+        # Fades up and down once per color
+        return 2 * self.steps * len(self.colors)
+
+    def _clip_params(self):
+        return (self.steps,)
+
+    def _clip_width(self):
+        # Every pixel shows the same color, so the clip is one color per frame
+        return 1
+
     def _update(self):
         # Update brightness
         self.current_brightness += self.fade_direction
@@ -128,11 +342,7 @@ class CycleFade(Animation):
         current_color = self.colors[self.current_color_index]
 
         # Set the pixel color based on the current brightness
-        self.pixels.fill((
-            int(current_color[0] * self.current_brightness / self.steps),
-            int(current_color[1] * self.current_brightness / self.steps),
-            int(current_color[2] * self.current_brightness / self.steps)
-        ))
+        self.frame.fill(tuple(channel * self.current_brightness // self.steps for channel in current_color))
 
 
 class Fade(Animation):
@@ -148,14 +358,25 @@ class Fade(Animation):
         :param speed: Speed rate relative to delay. (2.0 = double speed, 0.5 = half speed)
         """
         super().__init__(pixel_count, pixels, delay, speed, fps_render)
-        self.colors = colors
+        self.colors = list(colors)  # Copied since the colors are rotated in place
         self.steps = steps
         self.current_brightness = 0
         self.fade_direction = 1  # 1 for increasing, -1 for decreasing
-        self.adjusted_colors = [(0, 0, 0)] * pixel_count  # Pre-allocate adjusted colors
+        self.pixel_colors = self._build_pixel_colors()
         self.TAG = "Fade"
         Logger.info(self.TAG, "Loading the Fade animation")
 
+    def get_period(self):
+        # Fades up and down once per rotation of the colors
+        return 2 * self.steps * len(self.colors)
+
+    def _clip_params(self):
+        return (self.steps,)
+
+    def _clip_width(self):
+        # The colors are tiled, so the pattern repeats every len(colors) pixels
+        return min(len(self.colors), self.pixel_count)
+
     def _update(self):
         """Perform a fade in and fade out animation, cycling through the pixel colors."""
         # Update the brightness
@@ -169,20 +390,14 @@ class Fade(Animation):
             self.fade_direction = 1
             # Rotate the colors
             self.colors.append(self.colors.pop(0))  # Shift colors by 1
+            self.pixel_colors = self._build_pixel_colors()
 
-        # Calculate adjusted colors only if brightness changed
-        for i in range(self.pixel_count):
-            color_index = i % len(self.colors)
-            base_color = self.colors[color_index]
-            # Calculate the adjusted color and store it
-            self.adjusted_colors[i] = (
-                int(base_color[0] * self.current_brightness / self.steps),
-                int(base_color[1] * self.current_brightness / self.steps),
-                int(base_color[2] * self.current_brightness / self.steps)
-            )
+        # Scale every pixel by the current brightness in one go
+        self.frame.data[:] = self.pixel_colors * self.current_brightness // self.steps
 
-        # Set the pixel colors in one go
-        self.pixels[:] = self.adjusted_colors
+    def _build_pixel_colors(self):
+        """ Tiles the color scheme across the strip (widened to avoid overflow when scaling). """
+        return PALETTES.tile(self.colors, self.pixel_count, dtype=np.uint16)
 
 
 class Blink(Animation):
@@ -204,7 +419,7 @@ class Blink(Animation):
 
     def _update(self):
         current_color = self.colors[self.current_color_index]
-        self.pixels[:] = [current_color] * self.pixel_count  # Set all pixels to the current color
+        self.frame.fill(current_color)  # Set all pixels to the current color
 
         # Cycle to the next color
         self.current_color_index = (self.current_color_index + 1) % len(self.colors)
@@ -230,19 +445,19 @@ class Chase(Animation):
         Logger.info(self.TAG, "Loading the Chase animation")
 
         # Initialize strip with background color
-        self.pixels.fill(self.colors[1])
+        self.frame.fill(self.colors[1])
 
         # Set initial block to chase color
         for i in range(self.block_size):
-            self.pixels[i % self.pixel_count] = self.colors[0]
+            self.frame[i % self.pixel_count] = self.colors[0]
 
     def _update(self):
         # Clear the first pixel of the previous block
-        self.pixels[self.index % self.pixel_count] = self.colors[1]
+        self.frame[self.index % self.pixel_count] = self.colors[1]
 
         # Set the new tail pixel of the block to the chase color
         new_tail = (self.index + self.block_size) % self.pixel_count
-        self.pixels[new_tail] = self.colors[0]
+        self.frame[new_tail] = self.colors[0]
 
         # Move the starting index for the next update
         self.index = (self.index + 1) % self.pixel_count
@@ -261,22 +476,19 @@ class TwinkleStars(Animation):
         :param speed: Speed rate relative to delay. (2.0 = double speed, 0.5 = half speed)
         """
         super().__init__(pixel_count, pixels, delay, speed, fps_render)
-        self.colors = [(color[0] / 2, color[1] / 2, color[2] / 2) for color in colors]  # The base color when not twinkling
-        self.twinkle_color = 0xfff220  # The brighter twinkle color
+        self.colors = colors
+        self.twinkle_color = to_rgb(0xfff220)  # The brighter twinkle color
         self.twinkle_rate = twinkle_rate  # Chance that any pixel will twinkle on an update
-        for i in range(self.pixel_count):
-            self.pixels[i] = self.colors[i % len(self.colors)]
+        self.base_colors = PALETTES.tile(colors, pixel_count, brightness=128)  # The base colors (half brightness) when not twinkling
+        self.frame.data[:] = self.base_colors
         self.TAG = "TwinkleStars"
         Logger.info(self.TAG, "Loading the TwinkleStars animation")
 
     def _update(self):
-        for i in range(self.pixel_count):
-            if random.random() < self.twinkle_rate:
-                # Make the pixel "twinkle" (switch to twinkle color)
-                self.pixels[i] = self.twinkle_color
-            else:
-                # Restore pixel to base color
-                self.pixels[i] = self.colors[i % len(self.colors)]
+        # Restore every pixel to its base color, then "twinkle" a random subset
+        twinkling = np.random.random(self.pixel_count) < self.twinkle_rate
+        self.frame.data[:] = self.base_colors
+        self.frame.data[twinkling] = self.twinkle_color
 
 
 class CandleFlicker(Animation):
@@ -296,36 +508,26 @@ class CandleFlicker(Animation):
 
         # Initialize the colors for each pixel
         self.colors = CANDLE_COLORS_TUPLE  # Default to a single candle color if none provided
-        self.base_colors = [random.choice(self.colors) for _ in range(pixel_count)]  # Randomly choose base colors
+        self.base_colors = PALETTES.intern(self.colors).colors[np.random.randint(len(self.colors), size=pixel_count)]  # Randomly choose base colors
         self.min_brightness = min_brightness
         self.max_brightness = max_brightness
-        self.last_brightness = [1.0] * pixel_count  # Track last brightness for smooth transitions
+        self.last_brightness = np.ones(pixel_count)  # Track last brightness for smooth transitions
 
         self.TAG = "CandleFlicker"
         Logger.info(self.TAG, "Loading the CandleFlicker animation")
 
     def smooth_flicker(self):
-        for i in range(len(self.last_brightness)):
-            # Create a random target brightness within the specified range
-            target_brightness = random.uniform(self.min_brightness, self.max_brightness)
-            # Interpolate between the last brightness and the target brightness
-            self.last_brightness[i] += (target_brightness - self.last_brightness[i]) * 0.3  # Smooth transition
+        # Create a random target brightness within the specified range for every pixel
+        target_brightness = np.random.uniform(self.min_brightness, self.max_brightness, self.pixel_count)
+        # Interpolate between the last brightness and the target brightness
+        self.last_brightness += (target_brightness - self.last_brightness) * 0.3  # Smooth transition
 
     def _update(self):
         self.smooth_flicker()  # Update brightness values smoothly
 
-        current_colors = []  # Create a new list for the current colors
-        for i, base_color in enumerate(self.base_colors):
-            # Apply brightness to the selected base color
-            flickered_color = (
-                int(base_color[0] * self.last_brightness[i]),
-                int(base_color[1] * self.last_brightness[i]),
-                int(base_color[2] * self.last_brightness[i])
-            )
-            current_colors.append(flickered_color)  # Append the flickered color to the list
-
-        # Set all pixel colors in one go
-        self.pixels[:] = current_colors
+        # Apply brightness to the selected base colors in one go, as 8.8 fixed point
+        scale = (self.last_brightness * 256).astype(np.uint16)
+        self.frame.data[:] = self.base_colors * scale[:, np.newaxis] >> 8
 
 class Bouncing(Animation):
     def __init__(self, pixel_count, pixels, colors, delay=0.1, speed=1, block_size=3, fps_render=60):
@@ -351,7 +553,7 @@ class Bouncing(Animation):
         Logger.info(self.TAG, "Loading the Bouncing animation")
 
     def _update(self):
-        self.pixels.fill(self.colors[1])
+        self.frame.fill(self.colors[1])
 
         # Determine ranges for inner and outer blocks
         inner_start = max(0, int(self.indexInner))
@@ -360,8 +562,8 @@ class Bouncing(Animation):
         outer_end = min(self.pixel_count - 1, int(self.indexOutter + self.block_size - 1))
 
         # Set pixels for inner and outer blocks
-        self.pixels[inner_start:inner_end + 1] = [self.colors[0]] * (inner_end - inner_start + 1)
-        self.pixels[outer_start:outer_end + 1] = [self.colors[0]] * (outer_end - outer_start + 1)
+        self.frame[inner_start:inner_end + 1] = self.colors[0]
+        self.frame[outer_start:outer_end + 1] = self.colors[0]
 
         # Calculate distance remaining for realistic speed adjustment
         distance_inner = abs(self.indexInner - (self.pixel_count // 2 - self.block_size))
@@ -414,38 +616,28 @@ class Twinkle(Animation):
         self.seed = seed
         self.delta = delta
         self.mDelta = 0
-        self.random_start_points = []
         self.TAG = "Twinkle"
 
         # Initialize the pseudo-random starting points for each pixel
         random.seed(self.seed)
-        for _ in range(self.pixel_count):
-            self.random_start_points.append(random.randint(0, 255))
+        self.random_start_points = np.array([random.randint(0, 255) for _ in range(self.pixel_count)])
+
+        # Palette tiled across the strip, widened so it can be scaled without overflow
+        self.pixel_colors = PALETTES.tile(colors, pixel_count, dtype=np.uint16)
 
-    def _triwave8(self, x):
-        return int(127.5 * (1 + math.sin(math.radians(x * 360 / 255))))
+    def get_period(self):
+        # The wave position wraps every 255 steps of mDelta
+        return 255 // math.gcd(self.delta, 255)
 
-    def _dim8_lin(self, x):
-        return int((x / 255) ** 2.5 * 255)
+    def _clip_params(self):
+        return (self.seed, self.delta)
 
     def _update(self):
-        for i in range(self.pixel_count):
-            # Calculate brightness based on wave function and random starting point
-            start_point = self.random_start_points[i]
-            radians = (start_point + self.mDelta) % 255
-            raw_brightness = self._triwave8(radians)
-            brightness = self._dim8_lin(raw_brightness)
-
-            # Scale color by brightness
-            color = self.colors[i % len(self.colors)]
-            scaled_color = (
-                int(color[0] * brightness / 255),
-                int(color[1] * brightness / 255),
-                int(color[2] * brightness / 255)
-            )
+        # Look up every pixel's brightness from its position in the wave
+        brightness = TWINKLE_BRIGHTNESS_LUT[(self.random_start_points + self.mDelta) % 255]
 
-            # Set pixel color
-            self.pixels[i] = scaled_color
+        # Scale colors by brightness
+        self.frame.data[:] = self.pixel_colors * brightness[:, np.newaxis] // 255
 
         # Increment the delta for the next update
         self.mDelta += self.delta
@@ -468,49 +660,27 @@ class TwinkleCycle(Animation):
         self.seed = seed
         self.delta = delta
         self.mDelta = 0
-        self.random_start_points = []
-        self.color_indices = [random.randint(0, len(colors) - 1) for _ in range(pixel_count)]
-        self.brightness_hit_zero = [False] * self.pixel_count
+        self.palette = PALETTES.intern(colors).colors.astype(np.uint16)  # Widened so it can be scaled without overflow
+        self.color_indices = np.array([random.randint(0, len(colors) - 1) for _ in range(pixel_count)])
+        self.brightness_hit_zero = np.zeros(self.pixel_count, dtype=bool)
         self.TAG = "TwinkleCycle"
 
         # Initialize the pseudo-random starting points for each pixel
         random.seed(self.seed)
-        for _ in range(self.pixel_count):
-            self.random_start_points.append(random.randint(0, 255))
-
-    def _triwave8(self, x):
-        return int(127.5 * (1 + math.sin(math.radians(x * 360 / 255))))
-
-    def _dim8_lin(self, x):
-        return int((x / 255) ** 2.5 * 255)
+        self.random_start_points = np.array([random.randint(0, 255) for _ in range(self.pixel_count)])
 
     def _update(self):
-        for i in range(self.pixel_count):
-            # Calculate brightness based on wave function and random starting point
-            start_point = self.random_start_points[i]
-            radians = (start_point + self.mDelta) % 255
-            raw_brightness = self._triwave8(radians)
-            brightness = self._dim8_lin(raw_brightness)
-
-            # If brightness is zero, move to the next color in the palette
-            if brightness == 0 and not self.brightness_hit_zero[i]:
-                self.color_indices[i] = (self.color_indices[i] + 1) % len(self.colors)
-                self.brightness_hit_zero[i] = True
-            elif brightness != 0 and self.brightness_hit_zero[i]:
-                self.brightness_hit_zero[i] = False
-
-            # Get the current color for this pixel
-            color = self.colors[self.color_indices[i]]
-
-            # Scale color by brightness
-            scaled_color = (
-                int(color[0] * brightness / 255),
-                int(color[1] * brightness / 255),
-                int(color[2] * brightness / 255)
-            )
+        # Look up every pixel's brightness from its position in the wave
+        brightness = TWINKLE_BRIGHTNESS_LUT[(self.random_start_points + self.mDelta) % 255]
+
+        # If brightness just hit zero, move to the next color in the palette
+        is_zero = brightness == 0
+        next_color = is_zero & ~self.brightness_hit_zero
+        self.color_indices[next_color] = (self.color_indices[next_color] + 1) % len(self.palette)
+        self.brightness_hit_zero = is_zero
 
-            # Set pixel color
-            self.pixels[i] = scaled_color
+        # Scale each pixel's current color by brightness
+        self.frame.data[:] = self.palette[self.color_indices] * brightness[:, np.newaxis] // 255
 
         # Increment the delta for the next update
         self.mDelta += self.delta
@@ -533,7 +703,7 @@ class Cover(Animation):
         self.TAG = "Cover"
 
     def _update(self):
-        self.pixels[self.pixel_index] = self.colors[self.current_color_index]
+        self.frame[self.pixel_index] = self.colors[self.current_color_index]
         self.pixel_index += 1
 
         if self.pixel_index >= self.pixel_count:
@@ -561,16 +731,17 @@ class Cylon(Animation):
         self.reverse2 = True  # Second Cylon starts moving downwards
         self.color_index = 0  # To track the current color in the palette
         self.colors = colors  # Store the color palette
+        # Lookup table mapping every channel value to its faded value
+        self.fade_table = np.array([self.fade((v, v, v), fade_amount)[0] for v in range(256)], dtype=np.uint8)
         self.TAG = "Cylon"
 
     def _update(self):
         # Set the current LEDs to the color from the palette
-        self.pixels[self.position1] = self.colors[self.color_index]
-        self.pixels[self.position2] = self.colors[self.color_index]
+        self.frame[self.position1] = self.colors[self.color_index]
+        self.frame[self.position2] = self.colors[self.color_index]
 
         # Apply fading to all pixels
-        for i in range(self.pixel_count):
-            self.pixels[i] = self.fade(self.pixels[i], self.fade_amount)
+        self.frame.data[:] = self.fade_table[self.frame.data]
 
         # Move the first Cylon position back and forth
         self.position1 += 1 if not self.reverse1 else -1
@@ -607,6 +778,8 @@ class Cylon(Animation):
         b = max(0, b - fade_amount)
         return (r, g, b)
 
+HUE_WHEEL_SIZE = 1024  # Entries in the precomputed hue wheel (power of two so indices wrap with a mask)
+
 class RainbowWave(Animation):
     def __init__(self, pixel_count, pixels, colors=None, delay=0.06, speed=1.0, wavelength=20, phase_shift=0.1, fps_render=60):
         """
@@ -621,29 +794,68 @@ class RainbowWave(Animation):
         :param phase_shift: Amount the wave shifts each update
         """
         super().__init__(pixel_count, pixels, delay, speed, fps_render)
-        self.speed = speed * 0.5
+        self.phase_step = phase_shift * 0.5
         self.wavelength = wavelength
         self.phase_shift = phase_shift
         self.phase = 0
+        self.hue_wheel = self.get_hue_wheel()
+        self.wave_indices = self.get_wave_indices(pixel_count, wavelength)
+        self.hue_indices = np.empty(pixel_count, dtype=np.intp)  # Reused every update
         self.TAG = "RainbowWave"
 
-    def _update(self):
-        for i in range(self.pixel_count):
-            # Calculate the position in the wave
-            position_in_wave = (i / self.wavelength + self.phase) % 1.0
+    def get_period(self):
+        # Periodic if the phase returns to exactly 0 after a whole number of updates
+        phase_step = self.phase_step
+        if phase_step <= 0:
+            return None
+        step_fraction = Fraction(phase_step).limit_denominator(HUE_WHEEL_SIZE)
+        if abs(float(step_fraction) - phase_step) > 1e-9:
+            return None
+        return step_fraction.denominator
 
-            # Convert the position to a hue (0-255 scale for colors)
-            hue = int(position_in_wave * 255)
+    def _clip_params(self):
+        return (self.wavelength, self.phase_shift)
 
-            # Convert hue to RGB (Neopixel uses 0-255 scale)
-            r, g, b = self.hsv_to_rgb(hue / 255.0, 1.0, 1.0)
-            self.pixels[i] = (int(r * 255), int(g * 255), int(b * 255))
+    def _update(self):
+        # Shift every pixel's position on the hue wheel by the current phase
+        np.add(self.wave_indices, int(self.phase * HUE_WHEEL_SIZE), out=self.hue_indices)
+        np.bitwise_and(self.hue_indices, HUE_WHEEL_SIZE - 1, out=self.hue_indices)
+
+        # Gather the RGB colors straight into the frame
+        np.take(self.hue_wheel, self.hue_indices, axis=0, out=self.frame.data)
 
         # Move the wave forward
-        self.phase += self.phase_shift * self.speed
+        self.phase += self.phase_step
         if self.phase >= 1.0:
             self.phase -= 1.0
 
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def get_hue_wheel():
+        """
+        Builds the RGB hue wheel shared by every RainbowWave.
+
+        :return: HUE_WHEEL_SIZE x 3 uint8 array of fully saturated colors
+        """
+        wheel = np.empty((HUE_WHEEL_SIZE, 3), dtype=np.uint8)
+        for index in range(HUE_WHEEL_SIZE):
+            r, g, b = RainbowWave.hsv_to_rgb(index / HUE_WHEEL_SIZE, 1.0, 1.0)
+            wheel[index] = (int(r * 255), int(g * 255), int(b * 255))
+        return wheel
+
+    @staticmethod
+    @lru_cache(maxsize=8)
+    def get_wave_indices(pixel_count, wavelength):
+        """
+        Computes each pixel's position on the hue wheel before any phase shift.
+
+        :param pixel_count: Number of pixels on LEDs
+        :param wavelength: Number of pixels per cycle of the wave
+        :return: Array of hue wheel indices, one per pixel
+        """
+        positions = np.arange(pixel_count) / wavelength % 1.0
+        return (positions * HUE_WHEEL_SIZE).astype(np.intp)
+
     @staticmethod
     def hsv_to_rgb(h, s, v):
         """
@@ -688,45 +900,34 @@ class SparkleGlitter(Animation):
         :param fps_render: Target FPS
         """
         super().__init__(pixel_count, pixels, delay, speed, fps_render)
-        self.colors = [self._hex_to_rgb(c) for c in colors]
+        self.colors = PALETTES.intern(colors).colors.astype(np.int32)
         self.sparkle_chance = sparkle_chance
         self.fade_steps = fade_steps
-        self.fade_buffer = [None] * pixel_count  # Each entry: (r, g, b, step)
+        self.rng = np.random.default_rng()
+
+        # Fade state per pixel: the sparkle color and how many steps it has faded (-1 when idle)
+        self.spark_colors = np.zeros((pixel_count, 3), dtype=np.int32)
+        self.fade_step = np.full(pixel_count, -1, dtype=np.int32)
         self.TAG = "SparkleGlitter"
         Logger.info(self.TAG, "SparkleGlitter animation initialized")
 
-    def _hex_to_rgb(self, color):
-        if isinstance(color, int):
-            return ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
-        return color
-
     def _update(self):
-        for i in range(self.pixel_count):
-            # If currently fading
-            if self.fade_buffer[i] is not None:
-                r, g, b, step = self.fade_buffer[i]
-                step += 1
-                if step >= self.fade_steps:
-                    self.fade_buffer[i] = None
-                    self.pixels[i] = (0, 0, 0)
-                else:
-                    fade_factor = (self.fade_steps - step) / self.fade_steps
-                    self.pixels[i] = (
-                        int(r * fade_factor),
-                        int(g * fade_factor),
-                        int(b * fade_factor)
-                    )
-                    self.fade_buffer[i] = (r, g, b, step)
-
-            # Maybe start a new sparkle
-            elif random.random() < self.sparkle_chance:
-                color = random.choice(self.colors)
-                self.pixels[i] = color
-                self.fade_buffer[i] = (*color, 0)
-
-            else:
-                # Stay off if nothing else is going on
-                self.pixels[i] = (0, 0, 0)
+        # Advance pixels that are currently fading, and stop the ones that finished
+        fading = self.fade_step >= 0
+        self.fade_step[fading] += 1
+        self.fade_step[self.fade_step >= self.fade_steps] = -1
+        still_fading = self.fade_step >= 0
+
+        # Maybe start a new sparkle on idle pixels
+        sparkling = ~fading & (self.rng.random(self.pixel_count) < self.sparkle_chance)
+        self.spark_colors[sparkling] = self.colors[self.rng.integers(len(self.colors), size=np.count_nonzero(sparkling))]
+        self.fade_step[sparkling] = 0
+
+        # Stay off if nothing else is going on, otherwise show the (faded) sparkle
+        remaining = (self.fade_steps - self.fade_step[still_fading])[:, np.newaxis]
+        self.frame.clear()
+        self.frame.data[still_fading] = self.spark_colors[still_fading] * remaining // self.fade_steps
+        self.frame.data[sparkling] = self.spark_colors[sparkling]
 
 class BurstingSparkle(Animation):
     def __init__(self, pixel_count, pixels, colors, spark_colors=None, sparkle_density=0.15, fade_steps=6, delay=0.05, speed=1.0, fps_render=60):
@@ -750,44 +951,45 @@ class BurstingSparkle(Animation):
 
         self.sparkle_density = sparkle_density
         self.fade_steps = fade_steps
-        self.fade_buffer = [None] * pixel_count  # Each: (r, g, b, step)
+        self.rng = np.random.default_rng()
+        self.spark_palette = PALETTES.intern(self.spark_colors).colors.astype(np.int32)
+
+        # Fade state per pixel: the spark color and how many steps it has faded (-1 when idle)
+        self.pixel_sparks = np.zeros((pixel_count, 3), dtype=np.int32)
+        self.fade_step = np.full(pixel_count, -1, dtype=np.int32)
+        self.candidates = np.zeros(pixel_count, dtype=bool)
 
-        self.pixel_bases = [self.base_colors[i % len(self.base_colors)] for i in range(pixel_count)]
+        self.pixel_bases = PALETTES.tile(self.base_colors, pixel_count, dtype=np.int32)
         self.TAG = "BurstingSparkle"
         Logger.info(self.TAG, "BurstingSparkle initialized")
 
     def _update(self):
         num_to_sparkle = int(self.pixel_count * self.sparkle_density)
-        candidates = random.sample(range(self.pixel_count), num_to_sparkle)
-
-        for i in range(self.pixel_count):
-            base = self.pixel_bases[i]
-
-            if self.fade_buffer[i] is not None:
-                r, g, b, step = self.fade_buffer[i]
-                step += 1
-                if step >= self.fade_steps:
-                    self.fade_buffer[i] = None
-                    self.pixels[i] = base
-                else:
-                    fade_factor = (self.fade_steps - step) / self.fade_steps
-                    blended = (
-                        int(base[0] + (r - base[0]) * fade_factor),
-                        int(base[1] + (g - base[1]) * fade_factor),
-                        int(base[2] + (b - base[2]) * fade_factor),
-                    )
-                    self.pixels[i] = blended
-                    self.fade_buffer[i] = (r, g, b, step)
-
-            elif i in candidates:
-                spark = random.choice(self.spark_colors)
-                self.pixels[i] = spark
-                self.fade_buffer[i] = (*spark, 0)
-
-            else:
-                self.pixels[i] = base
+        self.candidates[:] = False
+        self.candidates[self.rng.choice(self.pixel_count, num_to_sparkle, replace=False)] = True
+
+        # Advance pixels that are currently fading, and return the finished ones to their base
+        fading = self.fade_step >= 0
+        self.fade_step[fading] += 1
+        self.fade_step[self.fade_step >= self.fade_steps] = -1
+        still_fading = self.fade_step >= 0
+
+        # Idle candidates start a new spark
+        sparking = ~fading & self.candidates
+        self.pixel_sparks[sparking] = self.spark_palette[self.rng.integers(len(self.spark_palette), size=np.count_nonzero(sparking))]
+        self.fade_step[sparking] = 0
+
+        # Blend fading sparks back towards their base color
+        base = self.pixel_bases[still_fading]
+        remaining = (self.fade_steps - self.fade_step[still_fading])[:, np.newaxis]
+        self.frame.data[:] = self.pixel_bases
+        self.frame.data[still_fading] = base + (self.pixel_sparks[still_fading] - base) * remaining // self.fade_steps
+        self.frame.data[sparking] = self.pixel_sparks[sparking]
 
 class Fireworks(Animation):
+    MIN_BURST_RADIUS = 3  # Smallest number of sparks on each side of a burst's center
+    MAX_BURST_RADIUS = 6  # Largest number of sparks on each side of a burst's center
+
     def __init__(self, pixel_count, pixels, colors, max_bursts=5, sparks_per_burst=10, fade_steps=10, delay=0.05, speed=1.0, fps_render=60):
         """
         Fireworks animation simulating rising and exploding particles.
@@ -809,82 +1011,47 @@ class Fireworks(Animation):
         self.sparks_per_burst = sparks_per_burst
         self.fade_steps = fade_steps
 
-        self.bursts = []  # List of active fireworks
-        self.pixel_buffer = [(0, 0, 0)] * pixel_count
+        # Sparks of every active firework, one group per burst
+        self.sparks = ParticleSystem(max_bursts * (2 * self.MAX_BURST_RADIUS + 1), pixel_count)
+        self.burst_count = 0
+        self.pixel_buffer = np.zeros((pixel_count, 3), dtype=np.int32)  # Widened for additive blending
         self.TAG = "Fireworks"
         Logger.info(self.TAG, "Fireworks animation initialized")
 
     def _spawn_firework(self):
         center = random.randint(8, self.pixel_count - 9)  # keep some padding
         color = random.choice(self.colors)
-        max_offset = random.randint(3, 6)  # how "big" the firework is
-
-        sparks = []
-        for offset in range(-max_offset, max_offset + 1):
-            pos = center + offset
-            if 0 <= pos < self.pixel_count:
-                sparks.append({
-                    "pos": pos,
-                    "color": color,
-                    "step": 0
-                })
-
-        self.bursts.append({
-            "sparks": sparks
-        })
-
-    def _update(self):
-        # Fade pixel buffer
-        for i in range(self.pixel_count):
-            r, g, b = self.pixel_buffer[i]
-            self.pixel_buffer[i] = (
-                int(r * 0.8),
-                int(g * 0.8),
-                int(b * 0.8)
-            )
-
-        # Update sparks
-        new_bursts = []
-        for burst in self.bursts:
-            active_sparks = []
-            for spark in burst["sparks"]:
-                spark["step"] += 1
-                if spark["step"] >= self.fade_steps:
-                    continue
+        max_offset = random.randint(self.MIN_BURST_RADIUS, self.MAX_BURST_RADIUS)  # how "big" the firework is
 
-                fade_factor = (self.fade_steps - spark["step"]) / self.fade_steps
-                r = int(spark["color"][0] * fade_factor)
-                g = int(spark["color"][1] * fade_factor)
-                b = int(spark["color"][2] * fade_factor)
+        self.burst_count += 1
+        positions = np.arange(center - max_offset, center + max_offset + 1)
+        self.sparks.emit(positions, color, self.fade_steps, group=self.burst_count)
 
-                pos = spark["pos"]
-                if 0 <= pos < self.pixel_count:
-                    pr, pg, pb = self.pixel_buffer[pos]
-                    self.pixel_buffer[pos] = (
-                        min(255, pr + r),
-                        min(255, pg + g),
-                        min(255, pb + b)
-                    )
-
-                active_sparks.append(spark)
-
-            if active_sparks:
-                new_bursts.append({"sparks": active_sparks})
+    def _update(self):
+        # Fade pixel buffer (integer equivalent of scaling by 0.8)
+        self.pixel_buffer *= 4
+        self.pixel_buffer //= 5
 
-        self.bursts = new_bursts
+        # Age the sparks and add them onto the buffer
+        self.sparks.step()
+        self.sparks.render_additive(self.pixel_buffer)
 
         # Occasionally trigger a new burst
-        if len(self.bursts) < self.max_bursts and random.random() < 0.1:
+        if self.sparks.active_groups() < self.max_bursts and random.random() < 0.1:
             self._spawn_firework()
 
-        # Update actual LED array
-        for i in range(self.pixel_count):
-            self.pixels[i] = self.pixel_buffer[i]
+        # Update the frame buffer
+        self.frame.data[:] = self.pixel_buffer
 
 if __name__ == "__main__":
+    from pixel_backend import create_backend
+
     LED_COUNT  = 400         # Number of LED pixels.
-    LED_PIN    = board.D18   # GPIO pin connected to the pixels (18 uses PWM!).
-    pixels = neopixel.NeoPixel(LED_PIN, LED_COUNT, pixel_order=neopixel.RGB, auto_write=False, brightness=1.0)
+    pixels = create_backend(LED_COUNT)
     colors = [(255, 0, 0), (255, 255, 255), (0, 0, 255)]
     animation = Fireworks(pixels.n, pixels, colors=colors, speed=1)
     animation.run_animation()
+
+    # The render engine runs on a daemon thread, so keep the process alive
+    while True:
+        time.sleep(1)
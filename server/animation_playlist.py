@@ -1,16 +1,21 @@
 
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from animation_constants import *
 import random
 
 class AnimationPlaylist:
-    def __init__(self, pixels, animations, color_schemes, speeds, time_delay=60):
+    def __init__(self, pixels, animations, color_schemes, speeds, time_delay=60, transition=0.0, durations=None, weights=None):
         self.pixels = pixels
         self.pixel_count = pixels.n
         self.animations = animations
         self.color_schemes = color_schemes
         self.speeds = speeds
         self.time_delay = time_delay
+        # Seconds each entry plays for (None falls back to time_delay) and how often shuffle picks it
+        self.durations = [time_delay if duration is None else duration for duration in (durations or [None] * len(animations))]
+        self.weights = weights if weights is not None else [1.0] * len(animations)
+        self.transition = transition  # Seconds to crossfade between animations (0 cuts straight over)
         self.thread = None
         self.shuffle = False
         self._stop_event = threading.Event()
@@ -22,7 +27,7 @@ class AnimationPlaylist:
     def start_playlist(self, shuffle=False):
         Logger.info(self.TAG, "Starting Playlist")
         self.shuffle = shuffle
-        if self.thread is None or not self._thread.is_alive():
+        if self.thread is None or not self.thread.is_alive():
             self._stop_event.clear()
             self.thread = threading.Thread(target=self._playlist_loop, daemon=True)
             self.thread.start()
@@ -35,48 +40,87 @@ class AnimationPlaylist:
             self.thread = None
 
     def _playlist_loop(self):
+        # The next animation is built and prewarmed on a worker while the current one plays
+        prewarm_executor = ThreadPoolExecutor(max_workers=1)
+        animation_index = self._next_index(None)
+        upcoming_animation = prewarm_executor.submit(self._prepare_animation, animation_index)
+        deadline = time.monotonic()
+
         while not self._stop_event.is_set():
-            for animation_index, animation in enumerate(self.animations):
-                if self._stop_event.is_set():
-                    break
-
-                # Stop the previous animation
-                if self.current_animation:
-                    self.current_animation.stop_animation()
-
-                # Pick a random color scheme
-                color_scheme_index = random.randrange(len(self.color_schemes))
-                if self.current_color_index is not None and self.current_color_index == color_scheme_index:
-                    color_scheme_index = (color_scheme_index + 1) % len(self.color_schemes)
-                self.current_color_index = color_scheme_index
-                self.current_animation = effect_classes[animation](
-                    self.pixel_count,
-                    self.pixels,
-                    colors=self.color_schemes[color_scheme_index],
-                    speed=self.speeds[animation_index],
-                    fps_render=30
-                )
-
-                # Play the animation
-                self.current_animation.run_animation()
-                start_time = time.monotonic()
-
-                while time.monotonic() - start_time < self.time_delay:
-                    if self._stop_event.is_set():
-                        break
+            self.current_animation = upcoming_animation.result()
+            duration = self.durations[animation_index]
+            animation_index = self._next_index(animation_index)
+            upcoming_animation = prewarm_executor.submit(self._prepare_animation, animation_index)
+
+            # Play the animation. The render engine keeps the previous one
+            # running until the crossfade finishes, then stops it
+            self.current_animation.run_animation(self.transition)
+
+            # Deadlines follow on from each other so the dwell times do not drift,
+            # unless the switch itself ran late
+            deadline = max(deadline, time.monotonic()) + duration
+            if self._stop_event.wait(max(deadline - time.monotonic(), 0)):
+                break
+
+        prewarm_executor.shutdown(wait=True, cancel_futures=True)
 
         # Ensure the last animation is stopped
         if self.current_animation:
             self.current_animation.stop_animation()
 
+    def _next_index(self, animation_index):
+        """
+        Picks the entry to play after the given one.
+
+        :param animation_index: Index of the entry playing now, or None to pick the first
+        :return: Index of the next entry
+        """
+        if not self.shuffle:
+            return 0 if animation_index is None else (animation_index + 1) % len(self.animations)
+
+        # Weighted pick, never repeating the entry that is playing now
+        weights = list(self.weights)
+        if animation_index is not None and len(weights) > 1:
+            weights[animation_index] = 0
+        if sum(weights) <= 0:
+            return 0 if animation_index is None else animation_index
+        return random.choices(range(len(self.animations)), weights=weights)[0]
+
+    def _prepare_animation(self, animation_index):
+        """
+        Builds the animation of a playlist entry and prewarms it, so starting it
+        only costs a swap in the render engine.
+
+        :param animation_index: Index of the entry in the playlist
+        :return: Animation instance, ready to run
+        """
+        # Pick a random color scheme
+        color_scheme_index = random.randrange(len(self.color_schemes))
+        if self.current_color_index is not None and self.current_color_index == color_scheme_index:
+            color_scheme_index = (color_scheme_index + 1) % len(self.color_schemes)
+        self.current_color_index = color_scheme_index
+
+        animation = effect_classes[self.animations[animation_index]](
+            self.pixel_count,
+            self.pixels,
+            colors=self.color_schemes[color_scheme_index],
+            speed=self.speeds[animation_index],
+            fps_render=30
+        )
+        start_time = time.monotonic()
+        animation.prewarm()
+        Logger.debug(self.TAG, f"Prewarmed {animation.TAG} in {(time.monotonic() - start_time) * 1000:.1f} ms")
+        return animation
+
 
 
 from color_palettes import *
 
 if __name__ == "__main__":
+    from pixel_backend import create_backend
+
     LED_COUNT  = 400         # Number of LED pixels.
-    LED_PIN    = board.D18   # GPIO pin connected to the pixels (18 uses PWM!).
-    pixels = neopixel.NeoPixel(LED_PIN, LED_COUNT, pixel_order=neopixel.RGB, auto_write=False, brightness=1.0)
+    pixels = create_backend(LED_COUNT)
 
     color_scheme_1 = [(255,0,0), (0,255,0), (255,255,255)]
     color_scheme_2 = [(255,255,255), (0,0,255)]
@@ -0,0 +1,109 @@
+import argparse
+import json
+import logging
+import os
+import random
+import time
+import tracemalloc
+import numpy as np
+from logger import Logger
+from animation_constants import AnimationId, effect_classes
+from color_palettes import CHRISTMAS_TREE_PALLETE
+from frame_buffer import to_rgb
+from pixel_backend import SimulatedBackend
+
+DEFAULT_PIXEL_COUNTS = [50, 400, 2000, 10000]
+DEFAULT_FRAMES = 200
+WARMUP_FRAMES = 10
+ALLOCATION_FRAMES = 20  # Frames traced for allocations (tracing slows updates down, so it runs separately)
+
+
+def benchmark_effect(effect_id, pixel_count, frames):
+    """
+    Runs one effect headlessly for a fixed number of updates.
+
+    :param effect_id: AnimationId value of the effect
+    :param pixel_count: Number of pixels to render
+    :param frames: Number of timed updates
+    :return: Dictionary of results
+    """
+    random.seed(0)
+    np.random.seed(0)
+    colors = [to_rgb(color) for color in CHRISTMAS_TREE_PALLETE]
+    pixels = SimulatedBackend(pixel_count, capture_frames=1, realtime=False)
+    effect = effect_classes[effect_id](pixel_count, pixels, colors)
+
+    for _ in range(WARMUP_FRAMES):
+        effect._update()
+
+    update_times = np.empty(frames)
+    for frame in range(frames):
+        start_time = time.perf_counter()
+        effect._update()
+        update_times[frame] = time.perf_counter() - start_time
+
+    # Peak memory allocated within each update, on top of what the effect already holds
+    tracemalloc.start()
+    allocated = 0
+    for _ in range(ALLOCATION_FRAMES):
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        effect._update()
+        _, peak = tracemalloc.get_traced_memory()
+        allocated += peak - baseline
+    tracemalloc.stop()
+
+    return {
+        "effect": AnimationId(effect_id).name,
+        "pixels": pixel_count,
+        "updates_per_second": round(frames / update_times.sum(), 1),
+        "p50_ms": round(float(np.percentile(update_times, 50)) * 1000, 4),
+        "p99_ms": round(float(np.percentile(update_times, 99)) * 1000, 4),
+        "alloc_kib_per_frame": round(allocated / ALLOCATION_FRAMES / 1024, 2),
+    }
+
+
+def run_benchmarks(effect_ids, pixel_counts, frames):
+    """ Benchmarks every combination of effect and pixel count. """
+    return [
+        benchmark_effect(effect_id, pixel_count, frames)
+        for effect_id in effect_ids
+        for pixel_count in pixel_counts
+    ]
+
+
+def format_table(results):
+    """ Formats benchmark results as a plain text table. """
+    header = f"{'Effect':<16}{'Pixels':>8}{'Updates/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'KiB/frame':>11}"
+    lines = [header, "-" * len(header)]
+    for result in results:
+        lines.append(
+            f"{result['effect']:<16}{result['pixels']:>8}{result['updates_per_second']:>12}"
+            f"{result['p50_ms']:>10}{result['p99_ms']:>10}{result['alloc_kib_per_frame']:>11}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every registered effect headlessly.")
+    parser.add_argument("--pixels", type=int, nargs="+", default=DEFAULT_PIXEL_COUNTS, help="LED counts to test")
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES, help="Timed updates per run")
+    parser.add_argument("--effects", nargs="+", help="Effect names to run (e.g. Twinkle RainbowWave). Defaults to all")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON instead of a table")
+    args = parser.parse_args()
+
+    if args.effects:
+        effect_ids = [AnimationId[name].value for name in args.effects]
+    else:
+        effect_ids = list(effect_classes)
+
+    # Effects log on construction; keep the output to the results
+    os.makedirs("output", exist_ok=True)
+    Logger.set_level(logging.WARNING)
+
+    results = run_benchmarks(effect_ids, args.pixels, args.frames)
+    print(json.dumps(results, indent=4) if args.json else format_table(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+class ChunkRing:
+    def __init__(self, chunk_bytes, slot_count):
+        """
+        Constructor for ChunkRing class. A preallocated ring of fixed-size
+        slots that a socket receives straight into. Each completed slot is
+        handed out as a memoryview, so chunks reach NumPy without being copied.
+
+        A slot is only reused after slot_count - 1 newer chunks, so the ring
+        must have more slots than chunks can be held downstream at once.
+
+        :param chunk_bytes: Size of one chunk
+        :param slot_count: Number of chunk slots in the ring
+        """
+        self.chunk_bytes = chunk_bytes
+        self.slot_count = slot_count
+        self.buffer = bytearray(chunk_bytes * slot_count)
+        self.view = memoryview(self.buffer)
+        self.slot = 0
+        self.fill = 0  # Bytes received into the current slot
+
+    def recv_into(self, sock):
+        """
+        Receives from a socket into the free part of the current slot.
+
+        :param sock: Connected socket
+        :return: Number of bytes received (0 if the peer closed the connection)
+        """
+        start = self.slot * self.chunk_bytes
+        received = sock.recv_into(self.view[start + self.fill:start + self.chunk_bytes])
+        self.fill += received
+        return received
+
+    def full_chunk(self):
+        """ Returns a view of the current slot once it holds a whole chunk, otherwise None. """
+        if self.fill < self.chunk_bytes:
+            return None
+        start = self.slot * self.chunk_bytes
+        return self.view[start:start + self.chunk_bytes]
+
+    def advance(self):
+        """ Hands the current slot off and moves on to the next one. """
+        self.slot = (self.slot + 1) % self.slot_count
+        self.fill = 0
+
+    def discard(self):
+        """ Drops whatever is in the current slot so it is received into again. """
+        self.fill = 0
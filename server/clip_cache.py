@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+from logger import Logger
+
+TAG = "ClipCache"
+
+DEFAULT_CLIP_CACHE_BYTES = 64 * 1024 * 1024  # 64 MiB of baked frames
+
+
+class ClipCache:
+    def __init__(self, max_bytes=DEFAULT_CLIP_CACHE_BYTES):
+        """
+        Constructor for ClipCache class. Holds prerendered clips (one full
+        cycle of a periodic effect as a frames x width x 3 uint8 array, width
+        being the pixels after which each frame repeats along the strip) and
+        evicts the least recently used clips once the memory cap is reached.
+
+        :param max_bytes: Memory cap for all cached clips
+        """
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._clips = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Looks up a clip and marks it as most recently used.
+
+        :param key: Clip key (effect, palette, LED count, speed, ...)
+        :return: Clip array, or None if not cached
+        """
+        with self._lock:
+            clip = self._clips.get(key)
+            if clip is None:
+                self.misses += 1
+                return None
+            self._clips.move_to_end(key)
+            self.hits += 1
+            return clip
+
+    def put(self, key, clip):
+        """
+        Stores a clip, evicting the least recently used clips to stay under the cap.
+
+        :param key: Clip key
+        :param clip: Frames x width x 3 uint8 array
+        :return: True if stored, False if the clip alone is larger than the cap
+        """
+        if clip.nbytes > self.max_bytes:
+            return False
+
+        with self._lock:
+            if key in self._clips:
+                self.total_bytes -= self._clips.pop(key).nbytes
+            while self._clips and self.total_bytes + clip.nbytes > self.max_bytes:
+                evicted_key, evicted = self._clips.popitem(last=False)
+                self.total_bytes -= evicted.nbytes
+                Logger.debug(TAG, f"Evicted clip for {evicted_key[0]} ({evicted.nbytes} bytes)")
+            self._clips[key] = clip
+            self.total_bytes += clip.nbytes
+        return True
+
+    def clear(self):
+        """ Removes every clip. """
+        with self._lock:
+            self._clips.clear()
+            self.total_bytes = 0
+
+    def get_stats(self):
+        """ Returns the number of clips, memory used and hit/miss counts. """
+        with self._lock:
+            return {
+                "clips": len(self._clips),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Shared by every effect so clips survive between trigger_effect calls and playlist entries
+CLIP_CACHE = ClipCache()
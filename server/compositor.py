@@ -0,0 +1,132 @@
+import numpy as np
+from frame_buffer import FrameBuffer
+
+# Blend modes
+BLEND_ALPHA = "alpha"  # Layer covers what is below it, weighted by opacity
+BLEND_ADD = "add"  # Layer is added to what is below it, saturating at full brightness
+BLEND_MAX = "max"  # Brightest of the layer and what is below it, per channel
+BLEND_MODES = (BLEND_ALPHA, BLEND_ADD, BLEND_MAX)
+
+FULL_OPACITY = 256  # Opacity is applied as 8.8 fixed point
+
+
+class Layer:
+    def __init__(self, name, pixel_count, effect=None, zone=None, opacity=1.0, blend=BLEND_ALPHA):
+        """
+        Constructor for Layer class. One entry in the compositor's stack,
+        either driven by an effect or holding a still frame.
+
+        :param name: Unique name of the layer (e.g. "audio")
+        :param pixel_count: Number of pixels on LEDs
+        :param effect: Animation rendering the layer, sized to the zone. None for a still frame
+        :param zone: (start, stop) range of pixels the layer covers. Defaults to the whole strip
+        :param opacity: Opacity of the layer (0.0 to 1.0)
+        :param blend: One of BLEND_MODES
+        """
+        if blend not in BLEND_MODES:
+            raise ValueError(f"Invalid blend mode: {blend}. Expected one of {BLEND_MODES}.")
+
+        start, stop = zone if zone is not None else (0, pixel_count)
+        if not 0 <= start < stop <= pixel_count:
+            raise ValueError(f"Invalid zone: {zone} for {pixel_count} pixels.")
+        if effect is not None and effect.pixel_count != stop - start:
+            raise ValueError(f"Effect renders {effect.pixel_count} pixels but the zone covers {stop - start}.")
+
+        self.name = name
+        self.effect = effect
+        self.zone = slice(start, stop)
+        self.opacity = min(max(opacity, 0.0), 1.0)
+        self.alpha = np.uint16(round(self.opacity * FULL_OPACITY))
+        self.blend = blend
+        self.still = FrameBuffer(stop - start) if effect is None else None
+        self.on_shown = []  # Callbacks for still frame updates waiting to reach the strip
+
+    @property
+    def frame(self):
+        """ Frame the layer currently shows. """
+        return self.effect.frame if self.effect is not None else self.still
+
+
+class Compositor:
+    def __init__(self, pixel_count):
+        """
+        Constructor for Compositor class. Blends a stack of layers over a base
+        frame into one output frame, each layer in one vectorized pass over
+        its zone.
+
+        :param pixel_count: Number of pixels on LEDs
+        """
+        self.output = FrameBuffer(pixel_count)
+        self.transition = FrameBuffer(pixel_count)  # Mix of two effects while crossfading between them
+        self._scratch = np.zeros((pixel_count, 3), dtype=np.uint16)  # Widened so blending cannot overflow
+        self._blend_scratch = np.zeros((pixel_count, 3), dtype=np.uint16)
+        self._last_layers = None
+
+    def compose(self, base, layers):
+        """
+        Blends the layers, bottom to top, over the base frame.
+
+        :param base: FrameBuffer at the bottom of the stack
+        :param layers: Sequence of Layer instances, bottom first
+        :return: Output FrameBuffer. Its changed flag is set if the base, any layer or the stack changed
+        """
+        changed = base.changed or layers is not self._last_layers
+        for layer in layers:
+            changed = changed or layer.frame.changed
+        self._last_layers = layers
+        if not changed:
+            return self.output
+
+        output = self.output.data
+        output[:] = base.data
+        for layer in layers:
+            self._blend(layer, output[layer.zone])
+            layer.frame.changed = False
+        base.changed = False
+        self.output.changed = True
+        return self.output
+
+    def crossfade(self, source, target, mix):
+        """
+        Mixes two frames in one pass.
+
+        :param source: FrameBuffer being faded out
+        :param target: FrameBuffer being faded in
+        :param mix: Progress of the fade (0.0 = all source, 1.0 = all target)
+        :return: FrameBuffer holding the mixed frame
+        """
+        alpha = np.uint16(round(min(max(mix, 0.0), 1.0) * FULL_OPACITY))
+        mixed = self._scratch
+        below = self._blend_scratch
+        np.multiply(target.data, alpha, out=mixed)
+        np.multiply(source.data, FULL_OPACITY - alpha, out=below)
+        mixed += below
+        mixed >>= 8
+        self.transition.data[:] = mixed
+        self.transition.changed = True
+        return self.transition
+
+    def _blend(self, layer, target):
+        """
+        Blends one layer into its zone of the output frame.
+
+        :param layer: Layer to blend
+        :param target: View of the output frame covered by the layer's zone
+        """
+        source = self._scratch[:len(target)]
+        np.multiply(layer.frame.data, layer.alpha, out=source)
+
+        if layer.blend == BLEND_ALPHA:
+            below = self._blend_scratch[:len(target)]
+            np.multiply(target, FULL_OPACITY - layer.alpha, out=below)
+            source += below
+            source >>= 8
+        elif layer.blend == BLEND_ADD:
+            source >>= 8
+            source += target
+            np.minimum(source, 255, out=source)
+        else:
+            source >>= 8
+            np.maximum(source, target, out=source)
+
+        target[:] = source
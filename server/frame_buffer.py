@@ -0,0 +1,47 @@
+import numpy as np
+
+
+def to_rgb(color):
+    """
+    Converts a color into an (r, g, b) tuple.
+
+    :param color: Either an int (0xRRGGBB) or an (r, g, b) sequence
+    :return: Tuple (r, g, b) with each value truncated to an int
+    """
+    if isinstance(color, (int, np.integer)):
+        return ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+    r, g, b = color
+    return (int(r), int(g), int(b))
+
+
+class FrameBuffer:
+    def __init__(self, pixel_count):
+        """
+        Constructor for FrameBuffer class. Holds one frame of RGB data as an
+        N x 3 uint8 array that effects render into.
+
+        :param pixel_count: Number of pixels on LEDs
+        """
+        self.pixel_count = pixel_count
+        self.data = np.zeros((pixel_count, 3), dtype=np.uint8)
+        self.changed = True  # Set whenever the frame may differ from the last one shown
+
+    def __len__(self):
+        return self.pixel_count
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def __setitem__(self, index, color):
+        self.data[index] = to_rgb(color)
+        self.changed = True
+
+    def fill(self, color):
+        """ Sets every pixel to the same color. """
+        self.data[:] = to_rgb(color)
+        self.changed = True
+
+    def clear(self):
+        """ Turns every pixel off. """
+        self.data.fill(0)
+        self.changed = True
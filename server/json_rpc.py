@@ -1,5 +1,6 @@
 
 from json import loads, dumps
+import math
 from alsaaudio import Mixer
 from logger import Logger
 from light_control import LightControl
@@ -9,6 +10,8 @@ from animation_playlist import AnimationPlaylist
 from enum import Enum
 from color_palettes import COLOR_PALETTES, CHRISTMAS_TREE_PALLETE
 from tcp_audio_sync import AudioVisualReceiver
+from clip_cache import CLIP_CACHE
+from palette_registry import PALETTES
 
 # json-rpc commnd tags
 METHOD_TAG = "method"
@@ -27,10 +30,17 @@ ANIMATION_EFFECT_ID_TAG = "animation_id"
 ANIMATIONS_TAG = "animations"
 COLOR_SCHEMES_TAG = "color_schemes"
 PLAYLIST_TIME_DELAY_TAG = "time_delay"
+PLAYLIST_TRANSITION_TAG = "transition"
+PLAYLIST_SHUFFLE_TAG = "shuffle"
+DURATION_TAG = "duration"
+WEIGHT_TAG = "weight"
+AV_OFFSET_TAG = "offset"
 URL_TAG = "url"
 VOLUME_TAG = "volume"
 LED_COUNT_TAG = "led_count"
 IS_ENABLED_TAG = "is_enabled"
+BRIGHTNESS_TAG = "brightness"
+GAMMA_TAG = "gamma"
 
 # error codes
 PARSE_ERROR = -32700
@@ -55,6 +65,7 @@ VALID_TAGS = [METHOD_TAG, PARAMS_TAG]
 DEFAULT_COLOR_SCHEME = [(255, 0, 0), (0, 255, 0)]
 DEFAULT_COLOR_PALLETE = [(30,124,32), (182,0,0), (0,55,251), (223,101,0), (129,0,219)]
 DEFAULT_PLAYLIST_TIME_DELAY = 120 # 2 minutes of delay
+DEFAULT_PLAYLIST_TRANSITION = 1.0 # 1 second crossfade between animations
 
 TAG = "JsonRpc"
 
@@ -68,12 +79,15 @@ class JsonRpc:
             "start_animation_playlist" : self._start_playlist,
             "stop_animation_playlist" : self._stop_playlist,
             "audio_sync_is_enabled" : self._set_audio_sync_is_enabled,
+            "set_audio_sync_offset" : self._set_audio_sync_offset,
             "set_volume" : self._set_volume,
             "set_led_count" : self._set_led_count,
+            "set_brightness" : self._set_brightness,
             "get_volume" : self._get_volume,
             "get_palettes" : self._get_palletes,
             "get_effects" : self._get_effects,
             "get_audio_sync_state": self._get_audio_sync_state,
+            "get_render_stats": self._get_render_stats,
         }
         self.light_controller = LightControl()
         self.animation_controller = None
@@ -137,10 +151,16 @@ class JsonRpc:
         return color_list
 
     def _convert_hex_to_colors(self, color_list):
-        return [
-            ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF) if isinstance(color, int) else color
-            for color in color_list
-        ]
+        # Interned, so repeated palettes are only converted once
+        return list(PALETTES.intern(color_list).rgb)
+
+    def _to_finite_float(self, value):
+        # None if the param is not a finite number
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+        return value if math.isfinite(value) else None
 
     def _set_light(self, params):
         Logger.info(TAG, "Calling set light")
@@ -189,7 +209,8 @@ class JsonRpc:
         pixel_count = self.light_controller.get_size()
         color_scheme = params.get(COLOR_SCHEME_TAG)
 
-        self._generic_teardown()
+        # The running animation is hot-swapped below, only a playlist needs stopping
+        self._stop_playlist_if_running()
 
         # Set the default color scheme based on the animation effect
         color_scheme = self._validate_color_list(color_scheme, DEFAULT_COLOR_SCHEME)
@@ -202,16 +223,18 @@ class JsonRpc:
 
         # Instantiate the appropriate animation class
         if effect_id in effect_classes:
-            self.animation_controller = effect_classes[effect_id](pixel_count, pixels, color_scheme, speed=speed)
+            animation_controller = effect_classes[effect_id](pixel_count, pixels, color_scheme, speed=speed)
         else:
             Logger.error(TAG, "No associated animation")
             return self._construct_error(INVALID_PARAMS)
 
-        if self.animation_controller is None:
+        if animation_controller is None:
             Logger.error(TAG, "Could not run animation")
             return self._construct_error(INVALID_PARAMS)
 
-        self.animation_controller.run_animation()
+        # Swaps out the previous animation at the next frame boundary without waiting on it
+        animation_controller.run_animation()
+        self.animation_controller = animation_controller
         return self._construct_result(True)
 
     def _start_playlist(self, params):
@@ -227,14 +250,28 @@ class JsonRpc:
 
         animations = []
         speeds = []
+        durations = []
+        weights = []
         for animation in animations_id:
             animation_id = animation.get(ANIMATION_EFFECT_ID_TAG)
             speed = animation.get(SPEED_TAG, 1.0)
             if animation_id is None:
                 Logger.warning(TAG, "Invalid animation provided. Skipping from playlist")
                 continue
+            duration = animation.get(DURATION_TAG)  # Falls back to time_delay if not given
+            if duration is not None:
+                duration = self._to_finite_float(duration)
+                if duration is None or duration <= 0:
+                    Logger.error(TAG, f"Invalid playlist duration: {animation.get(DURATION_TAG)}")
+                    return self._construct_error(INVALID_PARAMS)
+            weight = self._to_finite_float(animation.get(WEIGHT_TAG, 1.0))
+            if weight is None or weight < 0:
+                Logger.error(TAG, f"Invalid playlist weight: {animation.get(WEIGHT_TAG)}")
+                return self._construct_error(INVALID_PARAMS)
             animations.append(animation_id)
             speeds.append(speed)
+            durations.append(duration)
+            weights.append(weight)
 
         color_schemes = []
         for color_scheme in color_schemes_id:
@@ -242,12 +279,21 @@ class JsonRpc:
             color_scheme = self._convert_hex_to_colors(color_scheme)
             color_schemes.append(color_scheme)
 
+        time_delay = self._to_finite_float(params.get(PLAYLIST_TIME_DELAY_TAG, DEFAULT_PLAYLIST_TIME_DELAY))
+        if time_delay is None or time_delay <= 0:
+            Logger.error(TAG, f"Invalid playlist time delay: {params.get(PLAYLIST_TIME_DELAY_TAG)}")
+            return self._construct_error(INVALID_PARAMS)
+
+        transition = self._to_finite_float(params.get(PLAYLIST_TRANSITION_TAG, DEFAULT_PLAYLIST_TRANSITION))
+        if transition is None or transition < 0:
+            Logger.error(TAG, f"Invalid playlist transition: {params.get(PLAYLIST_TRANSITION_TAG)}")
+            return self._construct_error(INVALID_PARAMS)
+
         self._generic_teardown()
 
         pixels = self.light_controller.get_pixels()
-        time_delay = params.get(PLAYLIST_TIME_DELAY_TAG, DEFAULT_PLAYLIST_TIME_DELAY)
-        self.animation_playlist = AnimationPlaylist(pixels, animations, color_schemes, speeds, time_delay)
-        self.animation_playlist.start_playlist()
+        self.animation_playlist = AnimationPlaylist(pixels, animations, color_schemes, speeds, time_delay, transition, durations, weights)
+        self.animation_playlist.start_playlist(params.get(PLAYLIST_SHUFFLE_TAG, False))
         return self._construct_result(True)
 
     def _stop_playlist(self, params):
@@ -269,6 +315,18 @@ class JsonRpc:
         self.audio_visual_receiver.set_visualization_enabled(is_enabled)
         return self._construct_result(True)
 
+    def _set_audio_sync_offset(self, params):
+        try:
+            offset = float(params.get(AV_OFFSET_TAG))
+        except (TypeError, ValueError):
+            offset = None
+        if offset is None or not math.isfinite(offset):
+            Logger.error(TAG, f"Invalid audio sync offset: {params.get(AV_OFFSET_TAG)}")
+            return self._construct_error(INVALID_PARAMS)
+
+        self.audio_visual_receiver.set_av_offset(offset)
+        return self._construct_result(True)
+
     def _set_volume(self, params):
         volume_percentage = params.get(VOLUME_TAG)
         if volume_percentage is None:
@@ -288,6 +346,20 @@ class JsonRpc:
             self.light_controller = LightControl(led_count)
         return self._construct_result(True)
 
+    def _set_brightness(self, params):
+        brightness = params.get(BRIGHTNESS_TAG)
+        gamma = params.get(GAMMA_TAG)
+        if brightness is None and gamma is None:
+            Logger.error(TAG, "No brightness or gamma provided")
+            return self._construct_error(INVALID_PARAMS)
+
+        try:
+            self.light_controller.set_curve(brightness, gamma)
+        except ValueError as e:
+            Logger.error(TAG, str(e))
+            return self._construct_error(INVALID_PARAMS)
+        return self._construct_result(True)
+
     def _get_volume(self, params):
         volume_result = {
             VOLUME_TAG : self.volume_mixer.getvolume()[0]
@@ -303,11 +375,20 @@ class JsonRpc:
     def _get_audio_sync_state(self, params):
         return self._construct_result(self.audio_visual_receiver.is_enabled())
 
+    def _get_render_stats(self, params):
+        stats = self.light_controller.engine.get_timing_stats()
+        stats["clip_cache"] = CLIP_CACHE.get_stats()
+        stats["audio"] = self.audio_visual_receiver.get_stats()
+        return self._construct_result(stats)
+
     def _generic_teardown(self):
         if self.animation_controller is not None:
             self.animation_controller.stop_animation()
             self.animation_controller = None
 
+        self._stop_playlist_if_running()
+
+    def _stop_playlist_if_running(self):
         if self.animation_playlist is not None:
             self.animation_playlist.stop_playlist()
             self.animation_playlist = None
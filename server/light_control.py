@@ -1,40 +1,48 @@
 
-from neopixel import NeoPixel, RGB
-import board
 from logger import Logger
+from frame_buffer import to_rgb
+from output_stage import OutputStage
+from palette_registry import PALETTES
+from pixel_backend import create_backend
+from render_engine import RenderEngine
 import time
 
 TAG = "LightControl"
 
 # LED strip configuration:
 LED_COUNT  = 50         # Number of LED pixels.
-LED_PIN    = board.D18   # GPIO pin connected to the pixels (18 uses PWM!).
 
 class LightControl:
-    def __init__(self, led_size=LED_COUNT):
-        self.leds = NeoPixel(LED_PIN, led_size, pixel_order=RGB, auto_write=False, brightness=1.0)
+    def __init__(self, led_size=LED_COUNT, backend=None):
+        # Output backend defaults to the NeoPixel strip (LIGHTS_BACKEND=simulated runs without hardware)
+        self.leds = backend if backend is not None else create_backend(led_size)
+        self.engine = RenderEngine.for_pixels(self.leds)  # Only the render engine writes to the LEDs
+        # Global brightness and gamma are applied to every outgoing frame, effects render linear values
+        self.output_stage = OutputStage()
+        self.engine.set_output_stage(self.output_stage)
 
     def set_color(self, color):
         Logger.info(TAG, f"Setting color to {str(hex(color)).upper()}")
-        self.leds.fill(color)
-        self.show()
+        self.engine.display(to_rgb(color))
 
     def set_color_pallete(self, colors):
-        Logger.info(TAG, f"Setting color palette with {len(colors)} colors for {LED_COUNT} LEDs.")
+        Logger.info(TAG, f"Setting color palette with {len(colors)} colors for {self.get_size()} LEDs.")
 
         # Log the color palette with indices
         for index, color in enumerate(colors):
             Logger.info(TAG, f"{index}: {str(hex(color)).upper()}")
 
         # Apply the colors to the LEDs, cycling through the palette if necessary
-        for index in range(LED_COUNT):
-            self.leds[index] = colors[index % len(colors)]
+        self.engine.display(PALETTES.tile(colors, self.get_size()))
 
-        # Show the updated LED states
-        self.show()
+    def set_curve(self, brightness=None, gamma=None):
+        # Both applied in one table rebuild; raises ValueError (changing nothing) if either is invalid
+        Logger.info(TAG, f"Setting brightness to {brightness}, gamma to {gamma}")
+        self.output_stage.set_curve(brightness, gamma)
+        self.engine.refresh()
 
     def show(self):
-        self.leds.show()
+        self.engine.refresh()
 
     def get_pixels(self):
         return self.leds
@@ -51,3 +59,6 @@ if __name__ == '__main__':
     lights.set_color(0xFFFFFF)
     lights.show()
 
+    # Give the render engine time to transmit before the process exits
+    time.sleep(1)
+
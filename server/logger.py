@@ -28,6 +28,11 @@ class Logger:
 
             Logger._is_configured = True
 
+    @staticmethod
+    def set_level(level):
+        """ Sets the minimum level (e.g. logging.WARNING) that gets logged. """
+        Logger._logger.setLevel(level)
+
     @staticmethod
     def debug(tag, message):
         Logger._configure_logger()
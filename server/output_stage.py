@@ -0,0 +1,71 @@
+import math
+import numpy as np
+
+DEFAULT_BRIGHTNESS = 1.0
+DEFAULT_GAMMA = 1.0  # Linear, frames are shown exactly as the effects render them
+
+
+def build_output_lut(brightness=DEFAULT_BRIGHTNESS, gamma=DEFAULT_GAMMA):
+    """
+    Builds the table mapping every 8-bit channel value to its output value.
+
+    :param brightness: Global brightness (0.0 to 1.0)
+    :param gamma: Gamma curve exponent (1.0 = linear, ~2.2 for perceptual correction)
+    :return: 256-entry uint8 array
+    """
+    levels = np.arange(256) / 255
+    return np.round(255 * brightness * levels ** gamma).astype(np.uint8)
+
+
+class OutputStage:
+    def __init__(self, brightness=DEFAULT_BRIGHTNESS, gamma=DEFAULT_GAMMA):
+        """
+        Constructor for OutputStage class. Applies global brightness and gamma
+        to every outgoing frame through one 256-entry lookup table, so the hot
+        path is a single integer gather over the frame.
+
+        :param brightness: Global brightness (0.0 to 1.0)
+        :param gamma: Gamma curve exponent (1.0 = linear)
+        """
+        self.brightness = brightness
+        self.gamma = gamma
+        self.lut = None
+        self.set_curve(brightness, gamma)
+
+    def set_curve(self, brightness=None, gamma=None):
+        """
+        Rebuilds the lookup table. Omitted values keep their current setting.
+
+        :param brightness: Global brightness (0.0 to 1.0)
+        :param gamma: Gamma curve exponent (1.0 = linear), greater than 0
+        :raises ValueError: If brightness is not a finite number or gamma is not a finite number above 0
+        """
+        try:
+            brightness = self.brightness if brightness is None else float(brightness)
+            gamma = self.gamma if gamma is None else float(gamma)
+        except TypeError:
+            raise ValueError(f"Brightness and gamma must be numbers: {brightness}, {gamma}")
+        if not math.isfinite(brightness):
+            raise ValueError(f"Invalid brightness: {brightness}")
+        if not math.isfinite(gamma) or gamma <= 0:
+            raise ValueError(f"Invalid gamma: {gamma}. Expected a number greater than 0.")
+
+        self.brightness = min(max(brightness, 0.0), 1.0)
+        self.gamma = gamma
+
+        lut = build_output_lut(self.brightness, self.gamma)
+        # Identity tables are skipped entirely; the swap is a single reference assignment
+        self.lut = None if np.array_equal(lut, np.arange(256)) else lut
+
+    def apply(self, frame, out):
+        """
+        Maps a frame through the lookup table.
+
+        :param frame: N x 3 uint8 array
+        :param out: N x 3 uint8 array to write the output frame into
+        """
+        lut = self.lut
+        if lut is None:
+            out[:] = frame
+        else:
+            np.take(lut, frame, out=out)
@@ -0,0 +1,113 @@
+import threading
+import time
+import numpy as np
+from logger import Logger
+from scheduler import JitterStats
+
+
+class OutputThread:
+    def __init__(self, pixels):
+        """
+        Constructor for OutputThread class. Transmits frames on its own thread
+        with a front and back buffer: the render thread fills the back buffer
+        while the front buffer is on the wire, and the two are swapped at the
+        next frame boundary.
+
+        :param pixels: Pixel output backend (see pixel_backend.py)
+        """
+        self.pixels = pixels
+        self.front = np.zeros((len(pixels), 3), dtype=np.uint8)  # Owned by the output thread while transmitting
+        self.back = np.zeros((len(pixels), 3), dtype=np.uint8)  # Filled by the render thread
+        self._back_ready = False
+        self._back_callbacks = []  # Called with the time the back buffer finished transmitting
+        self._last_frame = np.zeros((len(pixels), 3), dtype=np.uint8)  # Last frame submitted, before the output stage
+        self._last_lut = None
+        self._has_last_frame = False
+        self._swap_lock = threading.Lock()  # Only held to fill or swap the buffers, never while transmitting
+        self._frame_event = threading.Event()
+        self.transmitted = 0
+        self.replaced = 0  # Frames overwritten by a newer one before they reached the wire
+        self.skipped = 0  # Frames identical to the previous one, never transmitted
+        self.transmit_time = JitterStats()
+        self.TAG = "OutputThread"
+
+        self._thread = threading.Thread(target=self._output_loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, output_stage=None, changed=True, force=False, on_shown=()):
+        """
+        Queues a frame for transmission. Returns as soon as the frame is copied
+        into the back buffer; a frame still waiting for the wire is replaced.
+        Frames identical to the previous one are skipped.
+
+        :param frame: N x 3 uint8 array
+        :param output_stage: Optional OutputStage to map the frame through while copying
+        :param changed: False if the caller knows the frame has not changed since the last submit
+        :param force: If True, transmits the frame even if it is unchanged
+        :param on_shown: Callables given the monotonic time the frame finished transmitting.
+                         Called right away if the frame is skipped, as it is already on the strip
+        :return: True if the frame was queued, False if it was skipped
+        """
+        lut = output_stage.lut if output_stage is not None else None
+        if not force and self._has_last_frame and lut is self._last_lut:
+            if not changed or np.array_equal(frame, self._last_frame):
+                self.skipped += 1
+                shown_time = time.monotonic()
+                for callback in on_shown:
+                    callback(shown_time)
+                return False
+
+        self._last_frame[:] = frame
+        self._last_lut = lut
+        self._has_last_frame = True
+
+        with self._swap_lock:
+            if output_stage is not None:
+                output_stage.apply(frame, self.back)
+            else:
+                self.back[:] = frame
+            if self._back_ready:
+                self.replaced += 1  # Its callbacks carry over to the frame replacing it
+            self._back_callbacks.extend(on_shown)
+            self._back_ready = True
+        self._frame_event.set()
+        return True
+
+    def get_stats(self):
+        """ Returns the frames transmitted, replaced and skipped, plus the time each transmit took. """
+        stats = self.transmit_time.summary()
+        stats["transmitted"] = self.transmitted
+        stats["replaced"] = self.replaced
+        stats["skipped"] = self.skipped
+        return stats
+
+    def get_mean_transmit_time(self):
+        """ Returns the mean seconds a transmit has taken so far, or 0.0 before the first one. """
+        stats = self.transmit_time
+        return stats.total / stats.count if stats.count else 0.0
+
+    def _output_loop(self):
+        """ Output loop used for thread. Waits for a frame, swaps it to the front and transmits it. """
+        while True:
+            self._frame_event.wait()
+            self._frame_event.clear()
+            with self._swap_lock:
+                if not self._back_ready:
+                    continue
+                self.front, self.back = self.back, self.front
+                self._back_ready = False
+                callbacks = self._back_callbacks
+                self._back_callbacks = []
+
+            start_time = time.monotonic()
+            try:
+                self.pixels.write(self.front)
+                self.pixels.show()
+            except Exception as e:
+                Logger.error(self.TAG, f"Failed to transmit frame: {e}")
+                continue
+            shown_time = time.monotonic()
+            self.transmit_time.record(shown_time - start_time)
+            self.transmitted += 1
+            for callback in callbacks:
+                callback(shown_time)
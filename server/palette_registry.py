@@ -0,0 +1,129 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from frame_buffer import to_rgb
+
+GRADIENT_STEPS = 256
+DEFAULT_MAX_PALETTES = 64
+DEFAULT_MAX_TILES = 32
+
+
+class Palette:
+    def __init__(self, rgb):
+        """
+        Constructor for Palette class. An interned, read-only color palette.
+
+        :param rgb: Tuple of (r, g, b) tuples
+        """
+        self.rgb = rgb
+        self.colors = np.array(rgb, dtype=np.uint8).reshape(-1, 3)
+        self.colors.flags.writeable = False
+        self._gradient = None
+
+    def __len__(self):
+        return len(self.rgb)
+
+    @property
+    def gradient(self):
+        """
+        256-step gradient that blends each color into the next, wrapping from
+        the last color back to the first. Built on first use.
+        """
+        if self._gradient is None:
+            positions = np.arange(GRADIENT_STEPS) * len(self.rgb) / GRADIENT_STEPS
+            lower = positions.astype(np.intp)
+            upper = (lower + 1) % len(self.rgb)
+            blend = (positions - lower)[:, np.newaxis]
+            colors = self.colors.astype(np.float32)
+            gradient = (colors[lower] * (1 - blend) + colors[upper] * blend).astype(np.uint8)
+            gradient.flags.writeable = False
+            self._gradient = gradient
+        return self._gradient
+
+
+class PaletteRegistry:
+    def __init__(self, max_palettes=DEFAULT_MAX_PALETTES, max_tiles=DEFAULT_MAX_TILES):
+        """
+        Constructor for PaletteRegistry class. Converts each palette once and
+        caches the derived lookup tables, evicting the least recently used
+        entries beyond the given bounds.
+
+        :param max_palettes: Maximum number of interned palettes
+        :param max_tiles: Maximum number of cached palette tiles
+        """
+        self.max_palettes = max_palettes
+        self.max_tiles = max_tiles
+        self._palettes = OrderedDict()
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def intern(self, colors):
+        """
+        Returns the interned palette for a list of colors, converting it on first use.
+
+        :param colors: Palette, or list of ints (0xRRGGBB) and/or (r, g, b) tuples
+        :return: Palette instance
+        """
+        if isinstance(colors, Palette):
+            return colors
+
+        key = tuple(color if isinstance(color, int) else tuple(color) for color in colors)
+        with self._lock:
+            palette = self._palettes.get(key)
+            if palette is not None:
+                self._palettes.move_to_end(key)
+                return palette
+
+        palette = Palette(tuple(self._convert(color) for color in colors))
+        with self._lock:
+            self._palettes[key] = palette
+            if len(self._palettes) > self.max_palettes:
+                self._palettes.popitem(last=False)
+        return palette
+
+    def gradient(self, colors):
+        """
+        Returns the 256-step gradient LUT of a palette.
+
+        :param colors: Palette or list of colors
+        :return: 256 x 3 uint8 read-only array
+        """
+        return self.intern(colors).gradient
+
+    def tile(self, colors, led_count, brightness=255, dtype=np.uint8):
+        """
+        Returns the palette repeated across the strip and scaled by brightness.
+
+        :param colors: Palette or list of colors
+        :param led_count: Number of pixels to tile across
+        :param brightness: Brightness to scale the colors by (0-255)
+        :param dtype: Array type, e.g. np.uint16 for tiles that get multiplied further
+        :return: led_count x 3 read-only array
+        """
+        palette = self.intern(colors)
+        key = (palette.rgb, led_count, brightness, np.dtype(dtype).str)
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                return tile
+
+        scaled = palette.colors.astype(np.uint16) * brightness // 255
+        tile = scaled.astype(dtype)[np.arange(led_count) % len(palette)]
+        tile.flags.writeable = False
+        with self._lock:
+            self._tiles[key] = tile
+            if len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        return tile
+
+    @staticmethod
+    def _convert(color):
+        try:
+            return to_rgb(color)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid palette entry: {color}. Expected int (0xRRGGBB) or (r,g,b) tuple.")
+
+
+# Shared by the JSON-RPC handlers, LightControl, the audio visualizer and the effects
+PALETTES = PaletteRegistry()
@@ -0,0 +1,82 @@
+import numpy as np
+
+
+class ParticleSystem:
+    def __init__(self, capacity, pixel_count):
+        """
+        Constructor for ParticleSystem class. Particles are stored as a
+        structure of arrays with a fixed capacity, so nothing is allocated
+        per particle once the system is created.
+
+        :param capacity: Maximum number of live particles
+        :param pixel_count: Number of pixels particles are rendered onto
+        """
+        self.capacity = capacity
+        self.pixel_count = pixel_count
+        self.positions = np.zeros(capacity, dtype=np.float32)
+        self.velocities = np.zeros(capacity, dtype=np.float32)  # Pixels moved per step
+        self.colors = np.zeros((capacity, 3), dtype=np.int32)
+        self.ages = np.zeros(capacity, dtype=np.int32)
+        self.lifetimes = np.ones(capacity, dtype=np.int32)
+        self.groups = np.zeros(capacity, dtype=np.int32)  # Lets callers track particles emitted together
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive))
+
+    def clear(self):
+        """ Kills every particle. """
+        self.alive[:] = False
+
+    def emit(self, positions, color, lifetime, velocities=0.0, group=0):
+        """
+        Spawns particles into free slots. Particles that do not fit within the
+        capacity are dropped.
+
+        :param positions: Pixel position of each new particle
+        :param color: (r, g, b) color shared by the new particles
+        :param lifetime: Number of steps before the particles die
+        :param velocities: Pixels moved per step, scalar or one per particle
+        :param group: Group id shared by the new particles
+        :return: Number of particles emitted
+        """
+        positions = np.asarray(positions, dtype=np.float32)
+        slots = np.flatnonzero(~self.alive)[:len(positions)]
+        count = len(slots)
+
+        self.positions[slots] = positions[:count]
+        self.velocities[slots] = np.broadcast_to(velocities, positions.shape)[:count]
+        self.colors[slots] = color
+        self.ages[slots] = 0
+        self.lifetimes[slots] = lifetime
+        self.groups[slots] = group
+        self.alive[slots] = True
+        return count
+
+    def active_groups(self):
+        """ Returns the number of distinct groups with live particles. """
+        return len(np.unique(self.groups[self.alive]))
+
+    def step(self):
+        """ Ages and moves every particle, killing the ones that expired or left the strip. """
+        alive = self.alive
+        self.ages[alive] += 1
+        self.positions[alive] += self.velocities[alive]
+        alive &= self.ages < self.lifetimes
+        alive &= (self.positions >= 0) & (self.positions < self.pixel_count)
+
+    def render_additive(self, buffer):
+        """
+        Adds every live particle onto a buffer, linearly faded by age, and
+        clamps the result to 255.
+
+        :param buffer: N x 3 integer array to composite onto (must be wider than uint8)
+        """
+        live = np.flatnonzero(self.alive)
+        if len(live) == 0:
+            return
+
+        remaining = (self.lifetimes[live] - self.ages[live])[:, np.newaxis]
+        faded = self.colors[live] * remaining // self.lifetimes[live][:, np.newaxis]
+        np.add.at(buffer, self.positions[live].astype(np.intp), faded)
+        np.minimum(buffer, 255, out=buffer)
@@ -0,0 +1,168 @@
+import os
+from abc import ABC, abstractmethod
+import time
+import numpy as np
+from logger import Logger
+
+TAG = "PixelBackend"
+
+# WS2811 timing: 24 bits per LED at 800 kHz, then the line is held low to latch
+WS2811_SECONDS_PER_PIXEL = 30e-6
+WS2811_LATCH_SECONDS = 280e-6
+
+# Environment variable used to pick the backend (e.g. LIGHTS_BACKEND=simulated)
+BACKEND_ENV_VAR = "LIGHTS_BACKEND"
+NEOPIXEL_BACKEND = "neopixel"
+SIMULATED_BACKEND = "simulated"
+
+
+class PixelBackend(ABC):
+    def __init__(self, pixel_count):
+        """
+        Constructor for PixelBackend class. A backend receives whole frames
+        from the render engine and transmits them to the lights.
+
+        :param pixel_count: Number of pixels on LEDs
+        """
+        self.n = pixel_count
+
+    def __len__(self):
+        return self.n
+
+    @abstractmethod
+    def write(self, frame):
+        """
+        Stages a frame to be transmitted by the next show().
+
+        :param frame: N x 3 uint8 array of (r, g, b) rows
+        """
+
+    @abstractmethod
+    def show(self):
+        """ Transmits the staged frame to the lights. """
+
+
+class NeoPixelBackend(PixelBackend):
+    def __init__(self, pixel_count, pin=None, brightness=1.0):
+        """
+        Constructor for NeoPixelBackend class. Drives a WS2811 strip through
+        the Adafruit NeoPixel library.
+
+        :param pixel_count: Number of pixels on LEDs
+        :param pin: GPIO pin connected to the pixels. Defaults to D18 (uses PWM)
+        :param brightness: NeoPixel brightness (0.0 to 1.0)
+        """
+        super().__init__(pixel_count)
+        # Only importable on the Pi, so imported here rather than at module level
+        import board
+        import neopixel
+
+        if pin is None:
+            pin = board.D18
+        self.leds = neopixel.NeoPixel(pin, pixel_count, pixel_order=neopixel.RGB, auto_write=False, brightness=brightness)
+        self._view = self._wire_view()
+
+    def _wire_view(self):
+        """
+        Returns a writable N x bpp view over the NeoPixel wire buffer, or None if
+        the buffer cannot be written directly (e.g. brightness scaling is enabled).
+
+        NeoPixel stores its pixels in a bytearray in wire order, so a NumPy view
+        over that bytearray lets a whole frame be written with one array assignment.
+        """
+        leds = self.leds
+        buffer = getattr(leds, "_post_brightness_buffer", None)
+        if buffer is None or getattr(leds, "_pre_brightness_buffer", None) is not None:
+            return None
+        if leds.brightness != 1.0:
+            return None
+        bpp = leds.bpp
+        return np.frombuffer(buffer, dtype=np.uint8, count=self.n * bpp, offset=leds._offset).reshape(-1, bpp)
+
+    def write(self, frame):
+        if self._view is None:
+            self.leds[:] = [tuple(color) for color in frame.tolist()]
+            return
+        self._view[:, self.leds._byteorder] = frame
+
+    def show(self):
+        self.leds.show()
+
+
+class SimulatedBackend(PixelBackend):
+    def __init__(self, pixel_count, capture_frames=120, realtime=True,
+                 seconds_per_pixel=WS2811_SECONDS_PER_PIXEL, latch_seconds=WS2811_LATCH_SECONDS):
+        """
+        Constructor for SimulatedBackend class. Keeps frames in memory instead
+        of driving hardware, so the server can run and be profiled off a Pi.
+
+        :param pixel_count: Number of pixels on LEDs
+        :param capture_frames: Number of most recent frames kept in the ring buffer
+        :param realtime: If True, show() blocks for as long as the strip would take to transmit
+        :param seconds_per_pixel: Wire time per LED
+        :param latch_seconds: Wire time to latch the frame after the last LED
+        """
+        super().__init__(pixel_count)
+        self.realtime = realtime
+        self.transmit_time = pixel_count * seconds_per_pixel + latch_seconds
+        self.staged = np.zeros((pixel_count, 3), dtype=np.uint8)
+        self.frames = np.zeros((capture_frames, pixel_count, 3), dtype=np.uint8)  # Ring buffer of shown frames
+        self.frame_count = 0
+        self.start_time = time.monotonic()
+
+    def write(self, frame):
+        self.staged[:] = frame
+
+    def show(self):
+        start_time = time.monotonic()
+        self.frames[self.frame_count % len(self.frames)] = self.staged
+        self.frame_count += 1
+
+        if self.realtime:
+            # Hold the caller for the rest of the wire time, as the real strip would
+            remaining = self.transmit_time - (time.monotonic() - start_time)
+            if remaining > 0:
+                time.sleep(remaining)
+
+    def latest_frame(self):
+        """ Returns the most recently shown frame (all zeros if nothing was shown). """
+        return self.frames[(self.frame_count - 1) % len(self.frames)]
+
+    def captured_frames(self):
+        """ Returns the frames held in the ring buffer, oldest first. """
+        count = min(self.frame_count, len(self.frames))
+        start = self.frame_count - count
+        return np.stack([self.frames[i % len(self.frames)] for i in range(start, self.frame_count)])
+
+    def max_fps(self):
+        """ Returns the highest frame rate the wire allows for this LED count. """
+        return 1 / self.transmit_time
+
+    def get_stats(self):
+        """ Returns the frames shown, the measured show rate and the wire-limited maximum. """
+        elapsed = time.monotonic() - self.start_time
+        return {
+            "frames": self.frame_count,
+            "fps": round(self.frame_count / elapsed, 1) if elapsed > 0 else 0.0,
+            "max_fps": round(self.max_fps(), 1),
+        }
+
+
+def create_backend(pixel_count, kind=None):
+    """
+    Creates the output backend for the lights.
+
+    :param pixel_count: Number of pixels on LEDs
+    :param kind: NEOPIXEL_BACKEND or SIMULATED_BACKEND. Defaults to the
+                 LIGHTS_BACKEND environment variable, then to NeoPixel
+    :return: PixelBackend instance
+    """
+    if kind is None:
+        kind = os.environ.get(BACKEND_ENV_VAR, NEOPIXEL_BACKEND)
+
+    if kind == SIMULATED_BACKEND:
+        Logger.info(TAG, f"Using simulated backend for {pixel_count} LEDs")
+        return SimulatedBackend(pixel_count)
+    if kind == NEOPIXEL_BACKEND:
+        return NeoPixelBackend(pixel_count)
+    raise ValueError(f"Unknown pixel backend: {kind}")
@@ -0,0 +1,339 @@
+import threading
+import time
+from logger import Logger
+from compositor import Compositor
+from frame_buffer import FrameBuffer
+from output_thread import OutputThread
+from scheduler import DeadlineScheduler, JitterStats
+
+SHOW_EVENT = "show"
+SWITCH_STAT = "switch"
+OUTPUT_STAT = "output"
+DEFAULT_FPS_RENDER = 60
+TIMING_REPORT_INTERVAL = 30  # Seconds between timing reports in the log
+
+
+class RenderEngine:
+    # One engine per pixel object, shared by every effect, playlist and visualizer
+    _engines = {}
+    _engines_lock = threading.Lock()
+
+    def __init__(self, pixels):
+        """
+        Constructor for RenderEngine class. Owns the output of a pixel object
+        and runs a single long-lived render thread that ticks whichever effect
+        is currently attached. Layers (overlays, zone effects) are blended
+        over it by a Compositor, and frames are handed to an OutputThread so
+        the render thread never waits for the wire.
+
+        :param pixels: Pixel output backend (see pixel_backend.py)
+        """
+        self.pixels = pixels
+        self.pixel_count = len(pixels)
+        self.frame = FrameBuffer(self.pixel_count)  # Still frame shown when no effect is attached
+        self.effect = None
+        self.layers = ()  # Layers blended over the effect or still frame, bottom first. Replaced, never mutated
+        self.compositor = Compositor(self.pixel_count)
+        self._pending_effect = None  # Effect to swap in at the next frame boundary
+        self._pending_transition = 0.0
+        self._outgoing_effect = None  # Previous effect, still rendering while it is crossfaded out
+        self._transition_start = 0.0
+        self._transition_duration = 0.0
+        self._swap_requested_time = None
+        self._awaiting_first_frame = False
+        self.switch_latency = JitterStats()  # Time from attach() to the new effect's first shown frame
+        self._frame_pending = False
+        self.output_stage = None  # Optional OutputStage applied to every frame before it is written
+        self.output = OutputThread(pixels)
+        self._lock = threading.RLock()  # Reentrant: dropping an effect may run its __del__ -> detach()
+        self._wake_event = threading.Event()
+        self.scheduler = DeadlineScheduler()
+        self.scheduler.add(SHOW_EVENT, 1 / DEFAULT_FPS_RENDER)
+        self.TAG = "RenderEngine"
+
+        self._thread = threading.Thread(target=self._render_loop, daemon=True)
+        self._thread.start()
+        Logger.info(self.TAG, f"Render engine started for {self.pixel_count} pixels")
+
+    @staticmethod
+    def for_pixels(pixels):
+        """
+        Returns the engine driving a pixel object, starting it on first use.
+
+        :param pixels: Pixel output backend
+        :return: Shared RenderEngine instance
+        """
+        with RenderEngine._engines_lock:
+            engine = RenderEngine._engines.get(id(pixels))
+            if engine is None:
+                engine = RenderEngine(pixels)
+                RenderEngine._engines[id(pixels)] = engine
+            return engine
+
+    def attach(self, effect, transition=0.0):
+        """
+        Swaps in an effect at the next frame boundary, replacing the current
+        one. Returns immediately without waiting for the swap.
+
+        :param effect: Animation instance to render
+        :param transition: Seconds to crossfade from the current effect (0 cuts straight over)
+        """
+        transition = float(transition)  # Raises here rather than on the render thread
+        with self._lock:
+            self._pending_effect = effect
+            self._pending_transition = transition
+            self._swap_requested_time = time.monotonic()
+        self._wake_event.set()
+
+    def detach(self, effect):
+        """
+        Stops ticking an effect. Does nothing if the effect is not the one
+        attached or waiting to be swapped in.
+
+        :param effect: Animation instance to stop rendering
+        """
+        with self._lock:
+            if self._pending_effect is effect:
+                self._pending_effect = None
+            if self.effect is effect:
+                self.effect = None
+                self._outgoing_effect = None
+            if self._outgoing_effect is effect:
+                self._outgoing_effect = None
+
+    def display(self, colors):
+        """
+        Shows a still frame, replacing any attached effect.
+
+        :param colors: A single (r, g, b) color or one (r, g, b) row per pixel
+        """
+        with self._lock:
+            self.effect = None
+            self._pending_effect = None
+            self._outgoing_effect = None
+            self.frame.data[:] = colors
+            self.frame.changed = True
+            self._frame_pending = True
+        self._wake_event.set()
+
+    def add_layer(self, layer):
+        """
+        Adds a layer on top of the stack, or replaces the layer with the same
+        name in place. Takes effect at the next frame boundary.
+
+        :param layer: Layer instance (see compositor.py)
+        """
+        if layer.effect is not None:
+            layer.effect.reset_clock()
+        with self._lock:
+            names = [existing.name for existing in self.layers]
+            if layer.name in names:
+                layers = list(self.layers)
+                layers[names.index(layer.name)] = layer
+                self.layers = tuple(layers)
+            else:
+                self.layers = self.layers + (layer,)
+            self._frame_pending = True  # Show the new stack even if nothing under it has changed
+        self._wake_event.set()
+
+    def remove_layer(self, name):
+        """
+        Removes a layer from the stack. Does nothing if there is no such layer.
+
+        :param name: Name of the layer
+        """
+        with self._lock:
+            layers = tuple(layer for layer in self.layers if layer.name != name)
+            if len(layers) == len(self.layers):
+                return
+            self.layers = layers
+            self._frame_pending = True  # Show what was under the layer again, effect or still frame
+        self._wake_event.set()
+
+    def update_layer(self, name, colors, on_shown=None):
+        """
+        Replaces the still frame of a layer.
+
+        :param name: Name of a layer added without an effect
+        :param colors: A single (r, g, b) color or one (r, g, b) row per pixel of the layer's zone
+        :param on_shown: Optional callable given the monotonic time the update finished transmitting
+        """
+        with self._lock:
+            for layer in self.layers:
+                if layer.name == name and layer.still is not None:
+                    layer.still.data[:] = colors
+                    layer.still.changed = True
+                    if on_shown is not None:
+                        layer.on_shown.append(on_shown)
+                    break
+        self._wake_event.set()
+
+    def get_layer(self, name):
+        """ Returns the layer with the given name, or None. """
+        for layer in self.layers:
+            if layer.name == name:
+                return layer
+        return None
+
+    def get_output_latency(self):
+        """
+        Returns the expected seconds from a frame update to it being on the
+        strip: one show interval plus the mean transmit time.
+        """
+        return self.scheduler.get_interval(SHOW_EVENT) + self.output.get_mean_transmit_time()
+
+    def refresh(self):
+        """ Retransmits the still frame if no effect is attached. """
+        with self._lock:
+            if self.effect is None and self._pending_effect is None:
+                self._frame_pending = True
+        self._wake_event.set()
+
+    def set_output_stage(self, output_stage):
+        """
+        Installs the stage that maps frames to output values (brightness, gamma).
+
+        :param output_stage: OutputStage instance, or None to write frames unchanged
+        """
+        with self._lock:
+            self.output_stage = output_stage
+            if self.effect is None and self._pending_effect is None:
+                self._frame_pending = True  # Show the still frame again with the new curve
+        self._wake_event.set()
+
+    def get_timing_stats(self):
+        """
+        Returns show jitter, render thread CPU usage, effect switch latency and
+        output thread transmit times, plus update jitter of the attached effect.
+        """
+        stats = self.scheduler.report()
+        stats[SWITCH_STAT] = self.switch_latency.summary()
+        stats[OUTPUT_STAT] = self.output.get_stats()
+        effect = self.effect
+        if effect is not None:
+            stats.update(effect.get_timing_stats())
+        return stats
+
+    def _render_loop(self):
+        """ Render loop used for thread. Sleeps until the next update or show deadline. """
+        self.scheduler.bind_thread()
+        self.scheduler.restart()
+        last_report_time = time.monotonic()
+        while True:
+            self._wake_event.clear()
+            with self._lock:
+                if self._pending_effect is not None:
+                    self._swap_in(self._pending_effect, self._pending_transition)
+                    self._pending_effect = None
+                effect = self.effect
+                outgoing = self._outgoing_effect
+                layers = self.layers
+                frame_pending = self._frame_pending
+                self._frame_pending = False
+                if frame_pending and effect is None and not layers:
+                    # Still frames are only submitted when asked for, so always retransmit them
+                    self.output.submit(self.frame.data, self.output_stage, force=True)
+
+            timeout = None
+            if effect is not None or layers:
+                timeout = self._tick(effect, outgoing, layers, frame_pending)
+
+            if time.monotonic() - last_report_time >= TIMING_REPORT_INTERVAL:
+                if effect is not None:
+                    Logger.debug(self.TAG, f"Timing stats: {self.get_timing_stats()}")
+                self.scheduler.reset_stats()
+                last_report_time = time.monotonic()
+
+            self._wake_event.wait(timeout)
+
+    def _swap_in(self, effect, transition):
+        """
+        Installs an effect as the attached one. Called with the lock held at a
+        frame boundary so the old effect never renders half a frame.
+
+        :param effect: Animation instance to render
+        :param transition: Seconds to keep rendering the old effect while crossfading to the new one
+        """
+        effect.reset_clock()
+        if transition > 0 and self.effect is not None and self.effect is not effect:
+            self._outgoing_effect = self.effect
+            self._transition_start = time.monotonic()
+            self._transition_duration = transition
+        else:
+            self._outgoing_effect = None
+        self.effect = effect
+        self.scheduler.set_interval(SHOW_EVENT, effect.show_interval)
+        self.scheduler.restart()
+        self._awaiting_first_frame = True
+
+    def _tick(self, effect, outgoing, layers, force=False):
+        """
+        Runs one iteration: updates the effect and any layer effects that are
+        due, then composes and shows the frame if due.
+
+        :param effect: Attached Animation instance, or None to show the still frame
+        :param outgoing: Previous effect being crossfaded out, or None
+        :param layers: Layers to blend over the effect or still frame
+        :param force: If True, shows the frame now even if it is unchanged
+        :return: Seconds until the next update or show deadline
+        """
+        if effect is not None and not self._update(effect):
+            self.detach(effect)
+            effect = None
+        if outgoing is not None and not self._update(outgoing):
+            self.detach(outgoing)
+            outgoing = None
+        for layer in layers:
+            if layer.effect is not None and not self._update(layer.effect):
+                self.remove_layer(layer.name)
+
+        if self.scheduler.is_due(SHOW_EVENT) or force:
+            base = effect.frame if effect is not None else self.frame
+            if effect is not None and outgoing is not None:
+                mix = (time.monotonic() - self._transition_start) / self._transition_duration
+                if mix < 1:
+                    base = self.compositor.crossfade(outgoing.frame, effect.frame, mix)
+                else:
+                    self.detach(outgoing)  # Transition finished, the old effect stops rendering
+                    outgoing = None
+            on_shown = []
+            # Composed under the lock: update_layer() and display() write still frames and their changed
+            # flags from other threads, so neither a half-written frame nor an update's callback can slip in
+            with self._lock:
+                for layer in layers:
+                    on_shown.extend(layer.on_shown)
+                    layer.on_shown.clear()
+                frame = self.compositor.compose(base, layers) if layers else base
+            # Skip the transmit if nothing has updated since the last show
+            self.output.submit(frame.data, self.output_stage, changed=frame.changed, force=force, on_shown=on_shown)
+            frame.changed = False
+
+            if effect is not None and self._awaiting_first_frame:
+                self._awaiting_first_frame = False
+                latency = time.monotonic() - self._swap_requested_time
+                self.switch_latency.record(latency)
+                Logger.debug(self.TAG, f"Switched to {effect.TAG} in {latency * 1000:.2f} ms")
+
+        deadlines = [self.scheduler.time_until_next()]
+        if effect is not None:
+            deadlines.append(effect.scheduler.time_until_next())
+        if outgoing is not None:
+            deadlines.append(outgoing.scheduler.time_until_next())
+        for layer in layers:
+            if layer.effect is not None:
+                deadlines.append(layer.effect.scheduler.time_until_next())
+        return min(deadlines)
+
+    def _update(self, effect):
+        """
+        Updates an effect if its update is due.
+
+        :param effect: Animation instance
+        :return: False if the update failed and the effect should stop rendering
+        """
+        try:
+            effect._update_with_timing()
+        except Exception as e:
+            Logger.error(self.TAG, f"{effect.TAG} failed to update, detaching: {e}")
+            return False
+        return True
@@ -0,0 +1,145 @@
+import threading
+import time
+
+
+class JitterStats:
+    def __init__(self):
+        """
+        Constructor for JitterStats class. Tracks how late scheduled events
+        fire relative to their deadlines.
+        """
+        self.reset()
+
+    def reset(self):
+        """ Clears all recorded samples. """
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, lateness):
+        """
+        Records one event.
+
+        :param lateness: Seconds between the deadline and when the event actually ran
+        """
+        self.count += 1
+        self.total += lateness
+        if lateness > self.max:
+            self.max = lateness
+
+    def summary(self):
+        """ Returns the mean/max lateness in milliseconds. """
+        mean = self.total / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "mean_ms": round(mean * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class DeadlineScheduler:
+    def __init__(self):
+        """
+        Constructor for DeadlineScheduler class. Keeps a fixed-rate deadline
+        for each named event so the render loop can sleep until the next one
+        is due instead of spinning.
+        """
+        self._intervals = {}
+        self._deadlines = {}
+        self.jitter = {}
+        self._cpu_clock = None
+        self._wall_start = time.monotonic()
+        self._cpu_start = 0.0
+
+    def add(self, name, interval):
+        """
+        Registers a periodic event, due immediately.
+
+        :param name: Name of the event (e.g. "update", "show")
+        :param interval: Seconds between consecutive deadlines
+        """
+        self._intervals[name] = interval
+        self._deadlines[name] = time.monotonic()
+        self.jitter[name] = JitterStats()
+
+    def set_interval(self, name, interval):
+        """ Changes the interval of an event, effective from its next deadline. """
+        self._intervals[name] = interval
+
+    def get_interval(self, name):
+        """ Returns the seconds between consecutive deadlines of an event. """
+        return self._intervals[name]
+
+    def bind_thread(self):
+        """ Measures CPU usage against the calling thread. Call from the thread that runs the loop. """
+        self._cpu_clock = time.pthread_getcpuclockid(threading.get_ident())
+        self._cpu_start = self._cpu_time()
+
+    def restart(self):
+        """ Makes every event due now and clears the stats. """
+        now = time.monotonic()
+        for name in self._deadlines:
+            self._deadlines[name] = now
+        self.reset_stats()
+
+    def is_due(self, name, now=None):
+        """
+        Checks whether an event is due and, if so, advances its deadline.
+
+        Deadlines advance by a fixed interval so timing does not drift. If the
+        loop fell behind by more than one interval the missed slots are
+        dropped rather than run back to back.
+
+        :param name: Name of the event
+        :param now: Current monotonic time (optional)
+        :return: True if the event should run now
+        """
+        if now is None:
+            now = time.monotonic()
+        deadline = self._deadlines[name]
+        if now < deadline:
+            return False
+
+        self.jitter[name].record(now - deadline)
+        next_deadline = deadline + self._intervals[name]
+        if next_deadline <= now:
+            next_deadline = now + self._intervals[name]
+        self._deadlines[name] = next_deadline
+        return True
+
+    def time_until_next(self, now=None):
+        """ Returns the number of seconds until the earliest deadline (0 if one is already due). """
+        if not self._deadlines:
+            return None
+        if now is None:
+            now = time.monotonic()
+        return max(0.0, min(self._deadlines.values()) - now)
+
+    def reset_stats(self):
+        """ Clears the jitter and CPU usage stats. """
+        for stats in self.jitter.values():
+            stats.reset()
+        self._wall_start = time.monotonic()
+        self._cpu_start = self._cpu_time()
+
+    def _cpu_time(self):
+        """ Returns the CPU time consumed by the loop thread so far. """
+        if self._cpu_clock is None:
+            return 0.0
+        try:
+            return time.clock_gettime(self._cpu_clock)
+        except OSError:
+            # loop thread has exited
+            return self._cpu_start
+
+    def report(self):
+        """
+        Returns the jitter per event and, if a thread is bound, its CPU usage
+        since the stats were last reset.
+        """
+        wall = time.monotonic() - self._wall_start
+        cpu = self._cpu_time() - self._cpu_start
+        report = {name: stats.summary() for name, stats in self.jitter.items()}
+        if self._cpu_clock is not None:
+            report["cpu_percent"] = round(100 * cpu / wall, 1) if wall > 0 else 0.0
+        return report
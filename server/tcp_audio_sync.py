@@ -4,9 +4,13 @@ import sounddevice as sd
 import threading
 import time
 import queue
-import neopixel
-import board
+from collections import deque
 from logger import Logger
+from chunk_ring import ChunkRing
+from compositor import Layer
+from render_engine import RenderEngine
+from scheduler import JitterStats
+from palette_registry import PALETTES
 
 PI_PORT = 5005
 SAMPLE_RATE = 44100
@@ -14,11 +18,25 @@ CHANNELS = 2
 AUDIO_CHUNK_SIZE = 4096
 AUDIO_CHUNK_BYTES = AUDIO_CHUNK_SIZE * CHANNELS * 2
 
+AUDIO_BYTES_PER_SECOND = SAMPLE_RATE * CHANNELS * 2
+AUDIO_QUEUE_SIZE = 256
+DSP_RING_BLOCKS = 4  # PCM blocks waiting for analysis; older ones are dropped once it is full
+RING_SPARE_SLOTS = DSP_RING_BLOCKS + 4  # Slots for blocks taken off the queue but still being played or analysed
+
 VIS_CHUNK_SIZE = 1024
+VIS_CHUNKS_PER_BLOCK = AUDIO_CHUNK_SIZE // VIS_CHUNK_SIZE
+VIS_BIN_COUNT = VIS_CHUNK_SIZE // 2
+VIS_CHUNK_SECONDS = VIS_CHUNK_SIZE / SAMPLE_RATE
+
+LED_JITTER_BUFFER_FRAMES = 64  # LED frames waiting for their audio to play (~1.5 s)
+DEFAULT_AV_OFFSET = 0.0  # Seconds added to every LED frame's display time (positive delays the lights)
+MAX_LED_LATENESS = 4 * VIS_CHUNK_SECONDS  # LED frames later than this no longer match what is heard and are dropped
 
 MIN_FREQ = 30
 MAX_FREQ = 20000
 
+AUDIO_LAYER = "audio"  # Compositor layer the visualizer draws on, over any running effect
+
 
 class AudioVisualReceiver:
     def __init__(self, pixels, color_palette, enabled = False):
@@ -45,21 +63,45 @@ class AudioVisualReceiver:
             latency="high"
         )
         self.stream.start()
+        self.output_latency = self.stream.latency  # Seconds from stream.write() returning to the block being heard
 
         # LEDs
         self.pixels = pixels
+        self.engine = RenderEngine.for_pixels(pixels)  # Frames are shown through the shared render engine
         self.color_palette = color_palette
         self.num_pixels = len(pixels)
+        self.pixel_colors = PALETTES.tile(color_palette, self.num_pixels)  # Palette repeated across the strip, one color per band
         self.palette_lock = threading.Lock()
+        if enabled:
+            self.engine.add_layer(Layer(AUDIO_LAYER, self.num_pixels))
 
         # Queues
-        self.audio_queue = queue.Queue(maxsize=256)
-        self.led_queue = queue.Queue(maxsize=2)
+        self.audio_queue = queue.Queue(maxsize=AUDIO_QUEUE_SIZE)
+        # Network receive ring; PCM blocks on the queue are views into it
+        self.receive_ring = ChunkRing(AUDIO_CHUNK_BYTES, AUDIO_QUEUE_SIZE + RING_SPARE_SLOTS)
+        self.bytes_received = 0
+        self.bytes_copied = 0  # Bytes of received audio copied from one buffer to another, socket receive included
+        # Blocks handed from playback to the DSP worker. deque appends and pops are atomic,
+        # so playback never waits on a lock, and maxlen drops the oldest block
+        self.dsp_blocks = deque(maxlen=DSP_RING_BLOCKS)
+        self.dsp_event = threading.Event()
+        self.dsp_dropped_blocks = 0
+        # Jitter buffer of (display time, LED frame), in display order
+        self.led_frames = deque(maxlen=LED_JITTER_BUFFER_FRAMES)
+        self.led_event = threading.Event()
+        self.av_offset = DEFAULT_AV_OFFSET
+        self.stale_led_frames = 0
+        self.av_skew = JitterStats()  # How late each LED frame finished transmitting relative to its audio
+        self.playout_delay = JitterStats()  # Time from a block arriving to it being heard
 
         # FFT state
         self.prev_mags = None
         self.max_mag = 1e-6
+        self.window = np.hanning(VIS_CHUNK_SIZE).astype(np.float32)  # Built once, applied to every sub-chunk
+        self.mags = np.zeros((VIS_CHUNKS_PER_BLOCK, VIS_BIN_COUNT), dtype=np.float32)  # Smoothed spectrum per sub-chunk
+        self.max_mags = np.zeros(VIS_CHUNKS_PER_BLOCK)  # AGC level after each sub-chunk
         self.freq_bins = np.logspace(np.log10(MIN_FREQ), np.log10(MAX_FREQ), self.num_pixels + 1)
+        self.band_edges = {}  # Spectrum size -> per-pixel bin ranges
 
         self.running = True
 
@@ -67,6 +109,7 @@ class AudioVisualReceiver:
         threading.Thread(target=self._connection_manager, daemon=True).start()
         threading.Thread(target=self._network_loop, daemon=True).start()
         threading.Thread(target=self._audio_loop, daemon=True).start()
+        threading.Thread(target=self._dsp_worker, daemon=True).start()
         threading.Thread(target=self._led_worker, daemon=True).start()
 
     # set color palette safely
@@ -76,40 +119,27 @@ class AudioVisualReceiver:
         - list of ints (0xRRGGBB)
         - mixed list (ints + tuples)
         """
-        processed = []
-
-        for item in new_palette:
-            if isinstance(item, int):
-                # Convert 0xRRGGBB → (R,G,B)
-                r = (item >> 16) & 0xFF
-                g = (item >> 8) & 0xFF
-                b = item & 0xFF
-                processed.append((r, g, b))
-
-            elif isinstance(item, (tuple, list)) and len(item) == 3:
-                # Already an RGB triple
-                r, g, b = item
-                processed.append((int(r), int(g), int(b)))
-
-            else:
-                raise ValueError(
-                    f"Invalid palette entry: {item}. "
-                    "Expected int (0xRRGGBB) or (r,g,b) tuple."
-                )
+        # Interned, so repeated palettes are only converted once (raises ValueError on invalid entries)
+        processed = list(PALETTES.intern(new_palette).rgb)
+        pixel_colors = PALETTES.tile(processed, self.num_pixels)
 
         # Store safely
         with self.palette_lock:
             self.color_palette = processed
+            self.pixel_colors = pixel_colors
 
     def set_visualization_enabled(self, enabled: bool):
         with self.visualization_lock:
             self.visualization_enabled = bool(enabled)
 
-        if not enabled:
-            # turn LEDs off
-            for i in range(self.num_pixels):
-                self.pixels[i] = (0,0,0)
-            self.pixels.show()
+        if enabled:
+            if self.engine.get_layer(AUDIO_LAYER) is None:
+                self.engine.add_layer(Layer(AUDIO_LAYER, self.num_pixels))
+        else:
+            self.engine.remove_layer(AUDIO_LAYER)
+            if self.engine.effect is None:
+                # turn LEDs off, unless an animation is running under the visualizer
+                self.engine.display((0, 0, 0))
 
         Logger.info(self.tag, f"Visualization/audio enabled = {enabled}")
 
@@ -137,34 +167,67 @@ class AudioVisualReceiver:
             time.sleep(0.2)
 
     def _network_loop(self):
-        buffer = b""
+        ring = self.receive_ring
         while self.running:
             if not self.connected:
                 time.sleep(0.05)
                 continue
 
             try:
-                data = self.conn.recv(8192)
+                received = ring.recv_into(self.conn)
+                arrival_time = time.monotonic()
             except (ConnectionResetError, OSError):
                 self._handle_disconnect()
                 continue
 
-            if not data:
+            if not received:
                 # client closed connection
                 self._handle_disconnect()
                 continue
 
-            buffer += data
+            # Copied once from the socket into the ring; chunks are handed on as views of it
+            self.bytes_received += received
+            self.bytes_copied += received
 
-            while len(buffer) >= AUDIO_CHUNK_BYTES:
-                raw = buffer[:AUDIO_CHUNK_BYTES]
-                buffer = buffer[AUDIO_CHUNK_BYTES:]
-                pcm = np.frombuffer(raw, dtype=np.int16).reshape((-1, CHANNELS))
+            chunk = ring.full_chunk()
+            if chunk is None:
+                continue
 
-                try:
-                    self.audio_queue.put_nowait(pcm)
-                except queue.Full:
-                    pass
+            pcm = np.frombuffer(chunk, dtype=np.int16).reshape((-1, CHANNELS))
+            try:
+                self.audio_queue.put_nowait((pcm, arrival_time))
+                ring.advance()
+            except queue.Full:
+                ring.discard()  # Dropped, so its slot can be received into again
+
+    def get_stats(self):
+        """
+        Returns the audio received, the bytes of it copied per second of audio
+        between the socket and the speaker, the blocks the DSP worker skipped to keep up, and how
+        closely the lights follow the audio.
+        """
+        audio_seconds = self.bytes_received / AUDIO_BYTES_PER_SECOND
+        return {
+            "bytes_received": self.bytes_received,
+            "bytes_copied": self.bytes_copied,
+            "copied_per_audio_second": round(self.bytes_copied / audio_seconds) if audio_seconds else 0,
+            "dsp_dropped_blocks": self.dsp_dropped_blocks,
+            "stale_led_frames": self.stale_led_frames,
+            "av_offset_ms": round(self.av_offset * 1000, 3),
+            "av_skew": self.av_skew.summary(),
+            "playout_delay": self.playout_delay.summary(),
+        }
+
+    def set_av_offset(self, offset):
+        """
+        Shifts the lights relative to the audio.
+
+        :param offset: Seconds added to every LED frame's display time (positive delays the lights)
+        """
+        offset = float(offset)  # Raises before the LED worker can see an invalid value
+        self.av_offset = offset
+        self.av_skew.reset()
+        Logger.info(self.tag, f"Audio/visual offset = {offset * 1000:.1f} ms")
 
     # Disconnect cleanup
     def _handle_disconnect(self):
@@ -176,12 +239,13 @@ class AudioVisualReceiver:
                 pass
             self.conn = None
             self.connected = False
+        self.receive_ring.discard()  # Partial chunk from the old connection
 
         # clear state
         while not self.audio_queue.empty():
             self.audio_queue.get_nowait()
-        while not self.led_queue.empty():
-            self.led_queue.get_nowait()
+        self.dsp_blocks.clear()
+        self.led_frames.clear()
 
         self.prev_mags = None
         self.max_mag = 1e-6
@@ -199,9 +263,9 @@ class AudioVisualReceiver:
                 continue
 
             try:
-                pcm = self.audio_queue.get(timeout=0.01)
+                pcm, arrival_time = self.audio_queue.get(timeout=0.01)
             except queue.Empty:
-                pcm = silence
+                pcm, arrival_time = silence, None
 
             # Check visualization state (controls both audio + LED)
             with self.visualization_lock:
@@ -214,91 +278,174 @@ class AudioVisualReceiver:
 
             # Otherwise normal audio output
             self.stream.write(pcm)
+            if arrival_time is not None:
+                self.bytes_copied += pcm.nbytes  # Copied into the stream's output buffer
+            # The block is queued behind the stream's buffer, so it is heard one output latency from now
+            playout_time = time.monotonic() + self.output_latency
+            if arrival_time is not None:
+                self.playout_delay.record(playout_time - arrival_time)
+
+            # Hand the block to the DSP worker, playback never waits on visualization
+            if len(self.dsp_blocks) == DSP_RING_BLOCKS:
+                self.dsp_dropped_blocks += 1  # The oldest block is pushed out
+            self.dsp_blocks.append((pcm, playout_time))
+            self.dsp_event.set()
+
+    # dsp thread
+    def _dsp_worker(self):
+        while self.running:
+            if not self.dsp_event.wait(timeout=0.1):
+                continue
+            self.dsp_event.clear()
 
-            # Now handle FFT + LED visualization (only when enabled)
-            for i in range(0, AUDIO_CHUNK_SIZE, VIS_CHUNK_SIZE):
-                vis = pcm[i:i+VIS_CHUNK_SIZE]
-
-                if len(vis) < VIS_CHUNK_SIZE:
-                    vis = np.pad(vis, ((0, VIS_CHUNK_SIZE-len(vis)), (0,0)))
-
-                mono = vis.mean(axis=1).astype(np.float32)
-                mags = self._perform_fft(mono)
-                led_frame = self._compute_led_colors(mags)
-
+            # Only analyse the newest block; older ones are stale by now
+            block = None
+            while True:
                 try:
-                    self.led_queue.put_nowait(led_frame)
-                except queue.Full:
-                    pass
+                    newer_block = self.dsp_blocks.popleft()
+                except IndexError:
+                    break
+                if block is not None:
+                    self.dsp_dropped_blocks += 1
+                block = newer_block
+            if block is None:
+                continue
+            pcm, playout_time = block
 
+            # FFT + LED visualization, each frame timed to when its slice of the block is heard
+            self._perform_fft(pcm)
+            for index, (mags, max_mag) in enumerate(zip(self.mags, self.max_mags)):
+                led_frame = self._compute_led_colors(mags, max_mag)
+                self.led_frames.append((playout_time + index * VIS_CHUNK_SECONDS, led_frame))
+            self.led_event.set()
 
     # led worker thread
     def _led_worker(self):
         while self.running:
             try:
-                frame = self.led_queue.get(timeout=0.1)
-            except queue.Empty:
+                display_time, frame = self.led_frames[0]
+            except IndexError:
+                self.led_event.wait(timeout=0.1)
+                self.led_event.clear()
+                continue
+
+            # Hand each frame over early enough that it reaches the strip as its audio is heard
+            output_latency = self.engine.get_output_latency()
+            wait_time = display_time + self.av_offset - output_latency - time.monotonic()
+            if wait_time > 0:
+                self.led_event.wait(timeout=wait_time)
+                self.led_event.clear()
+                continue
+
+            try:
+                self.led_frames.popleft()
+            except IndexError:
+                continue  # Cleared on disconnect
+
+            # Stale if the next frame is already due or it is too late to match the audio
+            now = time.monotonic() + output_latency
+            try:
+                next_display_time = self.led_frames[0][0]
+            except IndexError:
+                next_display_time = None
+            next_frame_due = next_display_time is not None and next_display_time + self.av_offset <= now
+            if next_frame_due or now - (display_time + self.av_offset) > MAX_LED_LATENESS:
+                self.stale_led_frames += 1
                 continue
 
             with self.visualization_lock:
                 if not self.visualization_enabled:
                     continue
 
-            for i, color in enumerate(frame):
-                self.pixels[i] = color
+            self.engine.update_layer(AUDIO_LAYER, frame, on_shown=self._skew_recorder(display_time + self.av_offset))
+
+    def _skew_recorder(self, target_time):
+        """
+        Returns a callback recording how late an LED frame reached the strip.
 
-            self.pixels.show()
+        :param target_time: Monotonic time the frame's audio is heard, plus the offset
+        """
+        return lambda shown_time: self.av_skew.record(shown_time - target_time)
 
     ## calculate DFT using FFT
-    def _perform_fft(self, chunk):
-        if np.all(chunk == 0):
-            self.max_mag *= 0.9
-            if self.prev_mags is None:
-                self.prev_mags = np.zeros(VIS_CHUNK_SIZE // 2)
-            else:
-                self.prev_mags *= 0.8
-            return self.prev_mags
+    def _perform_fft(self, pcm):
+        """
+        Transforms every visualization sub-chunk of a PCM block in one batched
+        real FFT, then smooths each spectrum into self.mags (and the AGC level
+        into self.max_mags) in order.
 
-        windowed = chunk * np.hanning(len(chunk))
-        fft = np.fft.fft(windowed)
-        mags = np.abs(fft[:len(fft)//2])
+        :param pcm: AUDIO_CHUNK_SIZE x CHANNELS int16 block
+        """
+        mono = pcm.mean(axis=1, dtype=np.float32)
+        if len(mono) < AUDIO_CHUNK_SIZE:
+            mono = np.pad(mono, (0, AUDIO_CHUNK_SIZE - len(mono)))
+            self.bytes_copied += mono.nbytes
+        chunks = mono.reshape(VIS_CHUNKS_PER_BLOCK, VIS_CHUNK_SIZE)
+        silent = ~chunks.any(axis=1)
+
+        chunks *= self.window
+        spectra = np.abs(np.fft.rfft(chunks, axis=1)[:, :VIS_BIN_COUNT])
+
+        for index, mags in enumerate(spectra):
+            if silent[index]:
+                self.max_mag *= 0.9
+                if self.prev_mags is None:
+                    self.prev_mags = np.zeros(VIS_BIN_COUNT, dtype=np.float32)
+                else:
+                    self.prev_mags *= 0.8
+            elif self.prev_mags is None:
+                self.prev_mags = mags.astype(np.float32)
+                self.max_mag = max(self.max_mag * 0.999, np.max(self.prev_mags))
+            else:
+                # smoothed = 0.25 * mags + 0.75 * prev, without temporaries
+                self.prev_mags *= 0.75
+                mags *= 0.25
+                self.prev_mags += mags
+                self.max_mag = max(self.max_mag * 0.999, np.max(self.prev_mags))
 
-        if self.prev_mags is None:
-            self.prev_mags = mags
+            self.mags[index] = self.prev_mags
+            self.max_mags[index] = self.max_mag
 
-        smoothed = 0.25*mags + 0.75*self.prev_mags
-        self.prev_mags = smoothed
-        self.max_mag = max(self.max_mag * 0.999, np.max(smoothed))
-        return smoothed
+    def _get_band_edges(self, bin_count):
+        """
+        Returns the FFT bin range [lo, hi) each pixel averages over, computed
+        once per spectrum size.
 
-    def _compute_led_colors(self, mags):
-        colors = []
-        N = len(mags) * 2
-        freq_per_bin = SAMPLE_RATE / N
-        local_max = max(self.max_mag, 1e-6)
+        :param bin_count: Number of magnitude bins in the spectrum
+        :return: Tuple of (lo, hi, widths) int arrays, one entry per pixel
+        """
+        edges = self.band_edges.get(bin_count)
+        if edges is None:
+            freq_per_bin = SAMPLE_RATE / (bin_count * 2)
+            bins = (self.freq_bins / freq_per_bin).astype(np.intp)
+            lo = bins[:-1]
+            hi = np.minimum(np.maximum(bins[1:], lo + 1), bin_count)  # Every band covers at least one bin
+            edges = (lo, hi, hi - lo)
+            self.band_edges[bin_count] = edges
+        return edges
+
+    def _compute_led_colors(self, mags, max_mag):
+        lo, hi, widths = self._get_band_edges(len(mags))
+        local_max = max(max_mag, 1e-6)
 
         with self.palette_lock:
-            palette = self.color_palette
+            pixel_colors = self.pixel_colors
 
-        for i in range(self.num_pixels):
-            lo = int(self.freq_bins[i] / freq_per_bin)
-            hi = int(self.freq_bins[i+1] / freq_per_bin)
-            if hi <= lo:
-                hi = lo + 1
+        # Mean magnitude of every band at once, from differences of the running sum
+        cumulative = np.concatenate(([0.0], np.cumsum(mags)))
+        brightness = (cumulative[hi] - cumulative[lo]) / (widths * local_max)
 
-            band_mag = np.mean(mags[lo:hi])
-            b = band_mag / local_max
-            c = palette[i % len(palette)]
-            colors.append((int(c[0]*b), int(c[1]*b), int(c[2]*b)))
-
-        return colors
+        # Scale the palette, tiled across the strip, by each pixel's band
+        colors = pixel_colors * brightness[:, np.newaxis]
+        return np.clip(colors, 0, 255).astype(np.uint8)
 
 
 if __name__ == "__main__":
+    from pixel_backend import create_backend
+
     LED_COUNT = 50
-    LED_PIN = board.D18
     COLOR_PALETTE = [(30, 124, 32), (182, 0, 0), (0, 55, 251), (223, 101, 0), (129, 0, 219)]
-    pixels = neopixel.NeoPixel(LED_PIN, LED_COUNT, pixel_order=neopixel.RGB, auto_write=False, brightness=1.0)
+    pixels = create_backend(LED_COUNT)
     receiver = AudioVisualReceiver(pixels, COLOR_PALETTE, True)
 
     time.sleep(10)